@@ -0,0 +1,79 @@
+"""Offline micro-benchmarks
+
+Run them from the bot directory, e.g. ``python -m benchmarks.datetime_parse``.
+"""
+
+import pathlib
+import time
+import tracemalloc
+import typing
+
+import wavelink
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+def measure(
+    fn: typing.Callable[[], typing.Any], *, repeat: int = 5, min_time: float = 0.2
+) -> float:
+    """Best time per call of ``fn`` in seconds
+
+    ``fn`` is called in rounds of at least ``min_time`` seconds, the fastest of
+    ``repeat`` rounds is kept.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+
+    return best
+
+
+def report(name: str, per_call: float) -> None:
+    print(f"{name:<40} {per_call * 1e6:>12.2f} us/call {1 / per_call:>14,.0f} ops/s")
+
+
+def peak_memory(fn: typing.Callable[[], typing.Any]) -> int:
+    """Peak bytes allocated while ``fn`` runs"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def playable(i: int, title: str) -> wavelink.Playable:
+    """A synthetic track, as Lavalink would return it"""
+    return wavelink.Playable(
+        {
+            "encoded": f"encoded{i}",
+            "info": {
+                "identifier": str(i),
+                "isSeekable": True,
+                "author": "author",
+                "length": 180_000,
+                "isStream": False,
+                "position": 0,
+                "title": title,
+                "uri": f"https://example.com/{i}",
+                "sourceName": "youtube",
+                "artworkUrl": None,
+                "isrc": None,
+            },
+            "pluginInfo": {},
+        }
+    )
@@ -0,0 +1,43 @@
+"""Parse cost of DatetimeTransformer over a corpus of real reminder phrases"""
+
+import datetime
+import itertools
+
+from plugins.utils.transformer import DatetimeTransformer
+
+from . import DATA, measure, report
+
+
+def main() -> None:
+    phrases = [
+        line.strip()
+        for line in (DATA / "reminder_phrases.txt").read_text().splitlines()
+        if line.strip()
+    ]
+    transformer = DatetimeTransformer()
+
+    # Every interaction has its own created_at, so don't reuse one anchor
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    anchors = itertools.cycle(
+        [start + datetime.timedelta(minutes=7 * i) for i in range(997)]
+    )
+
+    def parse_all() -> None:
+        for phrase in phrases:
+            try:
+                transformer.parse(phrase, next(anchors))
+            except Exception:
+                pass
+
+    def parse_all_cold() -> None:
+        transformer._simpletime.clear()
+        transformer._phrases.clear()
+        parse_all()
+
+    print(f"{len(phrases)} phrases")
+    report("cold (memo cleared every pass)", measure(parse_all_cold) / len(phrases))
+    report("warm", measure(parse_all) / len(phrases))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Queue autocomplete latency at different queue sizes
+
+Compares the indexed :meth:`Queue.search` against the previous approach of
+running ``difflib.get_close_matches`` over every queue line per keystroke.
+"""
+
+import difflib
+import random
+
+from plugins.utils.player import Queue
+
+from . import measure, playable, report
+
+WORDS = (
+    "love night dance heart fire rain summer blue dream city girl boy light "
+    "song world time baby money party moon star river road home feel remix "
+    "live acoustic version official video lyrics feat edit"
+).split()
+
+SIZES = (100, 10_000, 100_000)
+QUERIES = ("dance", "summer nights", "offical vido", "river road remix")
+
+
+def main() -> None:
+    rng = random.Random(0)
+
+    for size in SIZES:
+        tracks = [
+            playable(i, " ".join(rng.sample(WORDS, rng.randint(2, 6))))
+            for i in range(size)
+        ]
+        queue = Queue()
+        queue.put(tracks)
+
+        def first_search() -> None:
+            queue._invalidate()
+            queue.search(QUERIES[0])
+
+        def full_index() -> None:
+            queue._invalidate()
+            while queue._indexed < len(queue):
+                queue.search(QUERIES[0])
+
+        def indexed() -> None:
+            for query in QUERIES:
+                queue.search(query)
+
+        def difflib_scan() -> None:
+            for query in QUERIES:
+                options = [f"{i + 1}) {t.title}" for i, t in enumerate(queue)]
+                difflib.get_close_matches(query, options)
+
+        print(f"{size:,} tracks")
+        # A full difflib pass over 100k lines takes seconds, don't repeat it
+        slow = size > 10_000
+        report(
+            "  first search (one index batch)",
+            measure(first_search, repeat=1 if slow else 3, min_time=0),
+        )
+        report(
+            "  index build (whole queue)",
+            measure(full_index, repeat=1 if slow else 3, min_time=0),
+        )
+        report("  indexed search", measure(indexed) / len(QUERIES))
+        report(
+            "  difflib scan (before)",
+            measure(difflib_scan, repeat=1 if slow else 3, min_time=0) / len(QUERIES),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Memory held by queued tracks, full Playables against compact entries
+
+Tracks are parsed from JSON shaped like a Lavalink load result, so every
+string is its own allocation as in the bot. ``--sample`` guilds are built for
+real and the total is projected to ``--guilds``::
+
+    python -m benchmarks.queue_memory --guilds 1000 --tracks 1000
+"""
+
+import argparse
+import base64
+import json
+import random
+import tracemalloc
+import typing
+
+import wavelink
+from plugins.utils.player import Queue
+
+from .queue_autocomplete import WORDS
+
+
+def payload(rng: random.Random, tracks: int) -> str:
+    """A loadtracks-like response body with ``tracks`` YouTube tracks"""
+    data = []
+    for _ in range(tracks):
+        identifier = base64.urlsafe_b64encode(rng.randbytes(8)).decode()[:11]
+        data.append(
+            {
+                # Encoded YouTube tracks are typically 150-250 characters
+                "encoded": base64.b64encode(
+                    rng.randbytes(rng.randint(110, 190))
+                ).decode(),
+                "info": {
+                    "identifier": identifier,
+                    "isSeekable": True,
+                    "author": " ".join(rng.sample(WORDS, 2)).title(),
+                    "length": rng.randint(90_000, 420_000),
+                    "isStream": False,
+                    "position": 0,
+                    "title": " ".join(rng.sample(WORDS, rng.randint(3, 8))).title(),
+                    "uri": f"https://www.youtube.com/watch?v={identifier}",
+                    "sourceName": "youtube",
+                    "artworkUrl": f"https://i.ytimg.com/vi/{identifier}/maxresdefault.jpg",
+                    "isrc": None,
+                },
+                "pluginInfo": {},
+                "userData": {},
+            }
+        )
+    return json.dumps(data)
+
+
+def measure(
+    bodies: typing.List[str], factory: typing.Callable[[], wavelink.Queue]
+) -> int:
+    """Bytes still allocated once each body is loaded into its own queue"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        queues = []
+        for body in bodies:
+            queue = factory()
+            queue.put([wavelink.Playable(track) for track in json.loads(body)])
+            queues.append(queue)
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=1000)
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sample = min(args.sample, args.guilds)
+    bodies = [payload(rng, args.tracks) for _ in range(sample)]
+    scale = args.guilds / sample
+
+    print(f"{args.guilds:,} guilds x {args.tracks:,} tracks, {sample} guilds measured")
+    results = {}
+    for name, factory in (
+        ("wavelink.Queue (Playable)", wavelink.Queue),
+        ("Queue (QueueEntry)", Queue),
+    ):
+        used = measure(bodies, factory)
+        results[name] = used
+        print(
+            f"{name:<28} {used / (sample * args.tracks):>8,.0f} B/track "
+            f"{used * scale / 2**20:>10,.1f} MiB projected"
+        )
+
+    before, after = results.values()
+    print(f"{1 - after / before:.0%} less")
+
+
+if __name__ == "__main__":
+    main()
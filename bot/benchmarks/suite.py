@@ -0,0 +1,258 @@
+"""Queue, queue list and autocomplete costs across queue sizes
+
+Everything runs offline on synthetic tracks. Results are printed and written
+as JSON, so runs on different commits can be compared::
+
+    python -m benchmarks.suite --sizes 1000 10000 --output before.json
+
+Rendering the queue list imports the Music plugin, so run it from a
+directory with a config.yaml, like the bot itself.
+"""
+
+import argparse
+import asyncio
+import datetime
+import difflib
+import json
+import platform
+import random
+import time
+import types
+import typing
+
+from plugins.utils.player import Queue
+from plugins.utils.queue import AsyncLoopShuffleQueue
+
+from . import peak_memory, playable
+from .queue_autocomplete import QUERIES, WORDS
+
+State = typing.Any
+
+
+class Suite:
+    def __init__(self, *, repeat: int = 3) -> None:
+        self.repeat = repeat
+        self.results: typing.List[typing.Dict[str, typing.Any]] = []
+        self.loop = asyncio.new_event_loop()
+
+    def run(
+        self,
+        name: str,
+        size: int,
+        ops: int,
+        setup: typing.Callable[[], State],
+        fn: typing.Callable[[State], typing.Any],
+    ) -> None:
+        """Time ``fn`` on fresh state from ``setup``, which isn't timed
+
+        :param ops: Operations one call of ``fn`` performs
+        :type ops: int
+        """
+        best = float("inf")
+        for _ in range(self.repeat):
+            state = setup()
+            start = time.perf_counter()
+            fn(state)
+            best = min(best, time.perf_counter() - start)
+
+        state = setup()
+        peak = peak_memory(lambda: fn(state))
+
+        result = {
+            "name": name,
+            "size": size,
+            "ops": ops,
+            "seconds": best,
+            "ops_per_sec": ops / best if best else float("inf"),
+            "peak_bytes": peak,
+        }
+        self.results.append(result)
+        print(
+            f"{name:<40} {size:>8,} {result['ops_per_sec']:>14,.0f} ops/s "
+            f"{peak / 1024:>12,.1f} KiB peak"
+        )
+
+    def wait(self, coro: typing.Awaitable[typing.Any]) -> typing.Any:
+        return self.loop.run_until_complete(coro)
+
+
+def titles(size: int) -> typing.List[str]:
+    rng = random.Random(size)
+    return [" ".join(rng.sample(WORDS, rng.randint(2, 6))) for _ in range(size)]
+
+
+def shuffle_queue(suite: Suite, size: int, tracks: typing.List[typing.Any]) -> None:
+    def filled(**modes: bool) -> AsyncLoopShuffleQueue:
+        queue = AsyncLoopShuffleQueue(tracks)
+        if modes.get("shuffled"):
+            queue.shuffle()
+        if modes.get("loop"):
+            queue.loop()
+        return queue
+
+    async def drain(queue: AsyncLoopShuffleQueue, count: int) -> None:
+        for _ in range(count):
+            await queue.get()
+
+    def put(queue: AsyncLoopShuffleQueue) -> None:
+        for track in tracks:
+            queue.put(track)
+
+    def previous(queue: AsyncLoopShuffleQueue) -> None:
+        for _ in range(size - 1):
+            queue.previous()
+
+    def loop(queue: AsyncLoopShuffleQueue) -> None:
+        for _ in range(size):
+            queue.loop()
+
+    def shuffle(queue: AsyncLoopShuffleQueue) -> None:
+        for _ in range(size):
+            queue.shuffle()
+
+    def played() -> AsyncLoopShuffleQueue:
+        queue = filled()
+        suite.wait(drain(queue, size))
+        return queue
+
+    prefix = "AsyncLoopShuffleQueue"
+    suite.run(f"{prefix}.put", size, size, AsyncLoopShuffleQueue, put)
+    suite.run(f"{prefix}.get", size, size, filled, lambda q: suite.wait(drain(q, size)))
+    suite.run(
+        f"{prefix}.get shuffled",
+        size,
+        size,
+        lambda: filled(shuffled=True),
+        lambda q: suite.wait(drain(q, size)),
+    )
+    suite.run(
+        f"{prefix}.get loop all (2 passes)",
+        size,
+        2 * size,
+        lambda: filled(loop=True),
+        lambda q: suite.wait(drain(q, 2 * size)),
+    )
+    suite.run(f"{prefix}.previous", size, size - 1, played, previous)
+    suite.run(f"{prefix}.loop", size, size, filled, loop)
+    suite.run(f"{prefix}.shuffle", size, size, filled, shuffle)
+
+
+def player_queue(suite: Suite, size: int, tracks: typing.List[typing.Any]) -> None:
+    ops = min(size, 1000)
+
+    def filled() -> Queue:
+        queue = Queue()
+        queue.put(tracks)
+        return queue
+
+    def put(queue: Queue) -> None:
+        for track in tracks:
+            queue.put(track)
+
+    def get(queue: Queue) -> None:
+        for _ in range(ops):
+            queue.get()
+
+    def delete(queue: Queue) -> None:
+        # /queue remove of an item in the middle
+        for _ in range(ops):
+            queue.delete(len(queue) // 2)
+
+    prefix = "Queue"
+    suite.run(f"{prefix}.put", size, size, Queue, put)
+    suite.run(f"{prefix}.put playlist", size, size, Queue, lambda q: q.put(tracks))
+    suite.run(f"{prefix}.get", size, ops, filled, get)
+    suite.run(f"{prefix}.delete middle", size, ops, filled, delete)
+    suite.run(f"{prefix}.shuffle", size, 1, filled, lambda q: q.shuffle())
+
+
+def queue_list(suite: Suite, size: int, tracks: typing.List[typing.Any]) -> None:
+    from plugins.Music import QueuePageSource
+
+    def source() -> QueuePageSource:
+        queue = Queue()
+        queue.put(tracks)
+        return QueuePageSource(types.SimpleNamespace(queue=queue, current=tracks[0]))
+
+    async def render(source: QueuePageSource) -> None:
+        count = source.page_count
+        for index in (0, count // 2, count - 1):
+            await source.get_page(index)
+
+    suite.run(
+        "QueuePageSource.get_page", size, 3, source, lambda s: suite.wait(render(s))
+    )
+
+
+def autocomplete(suite: Suite, size: int, tracks: typing.List[typing.Any]) -> None:
+    def filled() -> Queue:
+        queue = Queue()
+        queue.put(tracks)
+        return queue
+
+    def indexed() -> Queue:
+        queue = filled()
+        while queue._indexed < len(queue):
+            queue.search(QUERIES[0])
+        return queue
+
+    def search(queue: Queue) -> None:
+        for query in QUERIES:
+            queue.search(query)
+
+    def index(queue: Queue) -> None:
+        while queue._indexed < len(queue):
+            queue.search(QUERIES[0])
+
+    def scan(queue: Queue) -> None:
+        for query in QUERIES:
+            options = [f"{i + 1}) {t.title}" for i, t in enumerate(queue)]
+            difflib.get_close_matches(query, options)
+
+    suite.run("Queue index build", size, size, filled, index)
+    suite.run("Queue.search", size, len(QUERIES), indexed, search)
+    if size <= 10_000:
+        suite.run(
+            "difflib scan (previous autocomplete)", size, len(QUERIES), filled, scan
+        )
+
+
+GROUPS = {
+    "shuffle_queue": shuffle_queue,
+    "player_queue": player_queue,
+    "queue_list": queue_list,
+    "autocomplete": autocomplete,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    suite = Suite(repeat=args.repeat)
+    for size in args.sizes:
+        tracks = [playable(i, title) for i, title in enumerate(titles(size))]
+        for group in args.groups:
+            GROUPS[group](suite, size, tracks)
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": suite.results,
+            },
+            f,
+            indent=2,
+        )
+
+    print(f"Wrote {len(suite.results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+# The bot imports its modules from this directory, e.g. plugins.utils.queue
+sys.path.insert(0, str(pathlib.Path(__file__).parent))
@@ -1,11 +1,13 @@
 import typing
 import asyncio
 import discord
+import wavelink
 from discord.ext import commands
 from discord.ext.commands import Cog
 from subclasses.bot import Bot
 from typing import Optional, Literal
 from .utils.embed import NeutralEmbed
+from .utils.player import Player
 
 
 class Developer(Cog):
@@ -67,7 +69,7 @@ class Developer(Cog):
         """
         Sync with github.
         """
-        parts = url.split('tree', 1) if url else None
+        parts = url.split("tree", 1) if url else None
 
         cmd = f"git pull {parts[0] if parts else ''} {(parts[-1].lstrip('/')) if url else ''}"
 
@@ -102,6 +104,105 @@ class Developer(Cog):
             mention_author=False,
         )
 
+    @commands.guild_only()
+    @commands.is_owner()
+    @commands.bot_has_permissions(send_messages=True, embed_links=True)
+    @commands.command(name="player")
+    async def _player(self, ctx: commands.Context):
+        """
+        Show playback stats of this guild's player.
+        """
+        player = ctx.guild.voice_client
+        if not isinstance(player, Player):
+            return await ctx.reply(
+                embed=NeutralEmbed("Not connected in this guild"), mention_author=False
+            )
+
+        embed = NeutralEmbed(title=f"Player on {player.node.identifier}")
+        embed.add_field(
+            name="Gap between tracks (s)", value=f"`{player.gaps}`", inline=False
+        )
+        embed.add_field(name="Queued", value=len(player.queue))
+        embed.add_field(name="Prefetched", value=player.prefetch_hits)
+        embed.add_field(name="Skipped", value=player.skipped)
+        embed.add_field(
+            name="Node recovery (s)", value=f"`{player.recoveries}`", inline=False
+        )
+
+        await ctx.reply(embed=embed, mention_author=False)
+
+    @commands.is_owner()
+    @commands.bot_has_permissions(send_messages=True, embed_links=True)
+    @commands.command(name="caches")
+    async def _caches(self, ctx: commands.Context):
+        """
+        Show the size of the shared caches and per-guild state.
+        """
+        embed = NeutralEmbed(title="Caches")
+        embed.add_field(
+            name="Guild state", value=f"`{self.bot.guild_states}`", inline=False
+        )
+        embed.add_field(name="Search", value=f"`{self.bot.search_cache}`", inline=False)
+        if store := self.bot.search_cache.store:
+            embed.add_field(name="Track store", value=f"`{store}`", inline=False)
+        embed.add_field(
+            name="Selections", value=f"`{self.bot.selections}`", inline=False
+        )
+        embed.add_field(
+            name="Known users", value=f"`{self.bot.known_users}`", inline=False
+        )
+
+        await ctx.reply(embed=embed, mention_author=False)
+
+    @commands.is_owner()
+    @commands.bot_has_permissions(send_messages=True, embed_links=True)
+    @commands.command(name="tracks")
+    async def _tracks(
+        self,
+        ctx: commands.Context,
+        action: Literal["export", "import"],
+        path: str = "track_cache.jsonl.gz",
+    ):
+        """
+        Export the stored search results to a file, or import them, e.g. to warm a new deploy.
+        """
+        store = self.bot.search_cache.store
+        if store is None:
+            return await ctx.reply(
+                embed=NeutralEmbed("The track store is not enabled"),
+                mention_author=False,
+            )
+
+        async with ctx.typing():
+            if action == "export":
+                count = await store.export(path)
+                message = f"Exported {count} results to `{path}`"
+            else:
+                count = await store.import_(path)
+                message = f"Imported {count} results from `{path}`"
+
+        await ctx.reply(embed=NeutralEmbed(message), mention_author=False)
+
+    @commands.is_owner()
+    @commands.bot_has_permissions(send_messages=True, embed_links=True)
+    @commands.command(name="drain")
+    async def _drain(self, ctx: commands.Context, node: str):
+        """
+        Move players off a Lavalink node, or stop draining it.
+        """
+        draining = self.bot.nodes.draining
+        if node not in wavelink.Pool.nodes:
+            message = f"No node called `{node}`"
+        elif node in draining:
+            draining.discard(node)
+            message = f"Node `{node}` takes new players again"
+        else:
+            draining.add(node)
+            players = len(wavelink.Pool.nodes[node].players)
+            message = f"Draining node `{node}`, moving {players} player{'s' if players != 1 else ''}"
+
+        await ctx.reply(embed=NeutralEmbed(message), mention_author=False)
+
 
 async def setup(bot: Bot):
     await bot.add_cog(Developer(bot))
@@ -2,6 +2,7 @@ import re
 import asyncio
 import contextlib
 import logging
+import time
 import typing
 
 import discord
@@ -10,12 +11,16 @@ from discord import app_commands
 from discord.ext import commands
 from discord.ext.commands import Cog
 from subclasses.bot import Bot
-from wavelink import Player
 
 from .utils import hyperlink
+from .utils.delivery import RateLimitBucket
 from .utils.embed import ErrorEmbed, NeutralEmbed, SuccessEmbed
+from .utils.idle import IdleSweeper
+from .utils.nowplaying import NowPlaying
+from .utils.persistence import PlayerStore
+from .utils.player import NODE_ERRORS, Player, QueueEntry
 from .utils.transformer import PlayableTransformer, QueueItemTransformer
-from .utils.view import Confirm
+from .utils.view import Confirm, PageSource, Paginator
 from datetime import datetime
 
 TIMEOUT = 300  # 5 minutes
@@ -63,16 +68,140 @@ class QueueItemMissing(MusicException):
     """Please select a queue item from the autocomplete list"""
 
 
+class QueuePageSource(PageSource):
+    """Pages of a player's queue, rendered from the live queue when shown
+
+    Every page holds ``per_page`` items and every line is clipped, so a page
+    is found by its offset and costs the same however long the queue is.
+    """
+
+    # Longest line, so a header and a full page always fit in a description
+    line_limit = 350
+
+    def __init__(self, player: Player, *, per_page: int = 10):
+        self.player = player
+        self.per_page = per_page
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.player.queue) // self.per_page))
+
+    def has_page(self, index: int) -> bool:
+        return 0 <= index < self.page_count
+
+    def _line(
+        self, prefix: str, playable: typing.Union[QueueEntry, wavelink.Playable]
+    ) -> str:
+        title = playable.title
+        if len(title) > 100:
+            title = title[:99] + "…"
+
+        line = f"{prefix} {hyperlink(title, playable.uri)}"
+        if len(line) > self.line_limit:
+            line = f"{prefix} {title}"
+        return line
+
+    async def get_page(self, index: int) -> discord.Embed:
+        queue = self.player.queue
+        offset = index * self.per_page
+
+        lines = []
+        length = 0
+
+        if current := self.player.current:
+            lines.append(self._line("**Currently playing:**", current))
+            length = len(lines[0])
+
+        for position, item in enumerate(queue[offset : offset + self.per_page], offset):
+            line = self._line(f"{position + 1})", item)
+
+            # +1 for the newline joining it to the previous line
+            if lines and length + len(line) + 1 > 4096:
+                break
+
+            lines.append(line)
+            length += len(line) + (1 if len(lines) > 1 else 0)
+
+        embed = NeutralEmbed(
+            title=f"{len(queue)} item{'s' if len(queue) != 1 else ''} in queue"
+        )
+        embed.description = "\n".join(lines)
+        embed.set_footer(text=f"Page {index + 1}/{self.page_count}")
+
+        return embed
+
+
 class Music(Cog):
     """Music commands"""
 
     def __init__(self, bot: Bot):
         self.bot = bot
 
-        self._tasks: typing.Dict[int, asyncio.Task] = {}
+        # Guilds whose player ran out of things to play, disconnected on timeout
+        self._idle = IdleSweeper(
+            self._on_idle,
+            timeout=self.bot.config.get("music", {}).get("idle_timeout", TIMEOUT),
+        )
+
+        self._now_playing_config = self.bot.config.get("music", {}).get(
+            "now_playing", {}
+        )
+
+        enqueue = self.bot.config.get("music", {}).get("enqueue", {})
+        self._enqueue_chunk = enqueue.get("chunk", 200)
+        self._enqueue_updates = enqueue.get("updates", 4)
+
+        # Player state saved to the database, restored after a restart
+        self._persistence = self.bot.config.get("music", {}).get("persistence", {})
+        self.store: typing.Optional[PlayerStore] = None
+        self._restore_task: typing.Optional[asyncio.Task] = None
+        # Guilds being reconnected by the restore, which starts playback itself
+        self._restoring: typing.Set[int] = set()
+
+        # Moving players off nodes that went down or are being drained
+        self._migration = self.bot.config.get("music", {}).get("migration", {})
+        self._migration_bucket = RateLimitBucket(
+            self._migration.get("rate", 5), self._migration.get("per", 1.0)
+        )
+        self._migrating: typing.Dict[int, asyncio.Task] = {}
+        # Node identifier -> when it was first seen disconnected
+        self._down_since: typing.Dict[str, float] = {}
+        # Whether players are waiting for a node to move to, so it's logged once
+        self._stranded = False
+        self._watch_task: typing.Optional[asyncio.Task] = None
 
         self.logger = logging.getLogger("discord.bot.plugins.Music")
 
+    async def cog_load(self) -> None:
+        self._idle.start()
+        self._watch_task = asyncio.create_task(self._watch_nodes())
+
+        if getattr(self.bot, "database", None) and self._persistence.get(
+            "enabled", True
+        ):
+            self.store = PlayerStore(
+                self.bot,
+                self._snapshot,
+                interval=self._persistence.get("interval", 5.0),
+            )
+            await self.store.start()
+
+    async def cog_unload(self) -> None:
+        await self._idle.close()
+        self._watch_task.cancel()
+        for task in self._migrating.values():
+            task.cancel()
+
+        if self._restore_task is not None:
+            self._restore_task.cancel()
+
+        if self.store is not None:
+            # Save every player as it is now, e.g. before a restart
+            for player in self.bot.voice_clients:
+                if isinstance(player, Player):
+                    self.store.mark(player.guild.id)
+            await self.store.close()
+
     async def cog_app_command_error(
         self, interaction: discord.Interaction, error: app_commands.AppCommandError
     ) -> None:
@@ -123,11 +252,32 @@ class Music(Cog):
             return
 
         if after.channel and not before.channel:
+            if member.guild.id in self._restoring:
+                return
+
             await self._on_wavelink_track_end(
                 wavelink.TrackEndEventPayload(
                     after.channel.guild.voice_client, None, "joined"
                 )
             )
+        elif before.channel and not after.channel:
+            self._cleanup(member.guild)
+        else:
+            self._changed(member.guild.id)
+
+    @commands.Cog.listener(name="on_guild_remove")
+    async def _on_guild_remove(self, guild: discord.Guild) -> None:
+        self._cleanup(guild)
+
+    @commands.Cog.listener(name="on_message")
+    async def _on_message(self, message: discord.Message) -> None:
+        if not message.guild:
+            return
+
+        state = self.bot.guild_states.get(message.guild.id)
+        controller = state.now_playing if state else None
+        if controller is not None and controller.channel.id == message.channel.id:
+            controller.seen(message)
 
     @commands.Cog.listener(name="on_wavelink_player_update")
     async def _on_wavelink_player_update(
@@ -142,7 +292,9 @@ class Music(Cog):
     async def _on_wavelink_track_start(
         self, payload: wavelink.TrackStartEventPayload
     ) -> None:
-        await self._send_current_playing(payload.player.channel, payload.player)
+        payload.player.track_started()
+        self._now_playing(payload.player).update()
+        self._changed(payload.player.guild.id)
 
     @commands.Cog.listener(name="on_wavelink_track_end")
     async def _on_wavelink_track_end(
@@ -156,32 +308,40 @@ class Music(Cog):
         self.logger.debug(
             f"{payload.reason} in guild {player.guild.name} ({player.guild.id})"
         )
+        if payload.reason == "finished":
+            player.track_finished()
+
+        await self._play_next(player)
+
+    async def _play_next(self, player: Player) -> None:
+        """Play the next queue item, or leave the player idle until one is queued"""
         try:
-            playable = player.queue.get()
-            await player.play(playable)
+            await player.play_next()
         except wavelink.QueueEmpty:
-            try:
-                task = self.bot.loop.create_task(
-                    asyncio.wait_for(player.queue.get_wait(), TIMEOUT)
-                )
-                self._tasks[player.channel.id] = task
-                try:
-                    playable = await task
-                    await player.play(playable)
-                except asyncio.CancelledError:
-                    self.logger.debug(
-                        f"{payload.player.guild.name} ({payload.player.guild.id}) Retrieving next song cancelled"
-                    )
-                finally:
-                    self._tasks.pop(player.channel.id, None)
-            except asyncio.TimeoutError:
-                self.bot.dispatch("wavelink_inactive_player", player)
-                
-    
+            self._idle.arm(player.guild.id)
+        except NODE_ERRORS as e:
+            # The track is still queued, try again when something else is
+            self.logger.warning(
+                f"{player.guild.name} ({player.guild.id}) Couldn't play the next track: {e}"
+            )
+            self._idle.arm(player.guild.id)
+
+    async def _queued(self, player: Player) -> None:
+        """Something was queued, start playing if the player was idle"""
+        self._changed(player.guild.id)
+        if self._idle.disarm(player.guild.id):
+            await self._play_next(player)
+
+    def _on_idle(self, guild_id: int) -> None:
+        guild = self.bot.get_guild(guild_id)
+        player = guild.voice_client if guild else None
+        if isinstance(player, Player) and player.current is None:
+            self.bot.dispatch("wavelink_inactive_player", player)
 
     @commands.Cog.listener(name="on_wavelink_inactive_player")
     async def _on_wavelink_inactive_player(self, player: Player):
         await player.disconnect()
+        self._cleanup(player.guild)
         now = datetime.utcnow()
         await player.channel.send(
             embed=SuccessEmbed(
@@ -194,35 +354,238 @@ class Music(Cog):
             f"{player.guild.name} ({player.guild.id}) Timed out due to inactivity."
         )
 
-    async def _send_current_playing(
-        self,
-        responseorchannel: typing.Union[
-            discord.TextChannel, discord.InteractionResponse
-        ],
-        player: Player,
-    ) -> None:
-        current = player.current
+    def _now_playing_embed(
+        self, player: typing.Optional[Player]
+    ) -> typing.Optional[discord.Embed]:
+        current = player.current if player else None
+        if not current:
+            return None
 
         embed = NeutralEmbed(title=current.title, url=current.uri)
         embed.set_thumbnail(url=current.artwork)
         embed.add_field(name="Artist", value=current.author)
         embed.add_field(name="Source", value=current.source.capitalize())
 
-        if extras := self.bot.voice_extras.get(player.guild.id, None):
-            if msg := extras.get("last_current_message", None):
-                with contextlib.suppress(
-                    discord.NotFound, discord.Forbidden, discord.HTTPException
-                ):
-                    await msg.delete()
+        return embed
+
+    def _now_playing(self, player: Player) -> NowPlaying:
+        guild = player.guild
+        state = self.bot.guild_states.state(guild.id)
 
-        if isinstance(responseorchannel, discord.InteractionResponse):
-            msg = await responseorchannel.send_message(embed=embed)
+        controller = state.now_playing
+        if controller is not None:
+            controller.move(player.channel)
         else:
-            msg = await responseorchannel.send(embed=embed)
+            controller = state.now_playing = NowPlaying(
+                player.channel,
+                lambda: self._now_playing_embed(guild.voice_client),
+                **self._now_playing_config,
+            )
+
+        return controller
+
+    def _changed(self, guild_id: int) -> None:
+        """Save the guild's player with the next batch"""
+        if self.store is not None:
+            self.store.mark(guild_id)
 
-        if not self.bot.voice_extras.get(player.guild.id):
-            self.bot.voice_extras[player.guild.id] = {}
-        self.bot.voice_extras[player.guild.id]["last_current_message"] = msg
+    def _snapshot(self, guild_id: int) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        guild = self.bot.get_guild(guild_id)
+        player = guild.voice_client if guild else None
+        if not isinstance(player, Player):
+            return None
+
+        state = player.snapshot()
+        if state is not None:
+            record = self.bot.guild_states.get(guild_id)
+            controller = record.now_playing if record else None
+            state["message"] = controller.message_id if controller else None
+
+        return state
+
+    @commands.Cog.listener(name="on_wavelink_node_ready")
+    async def _on_wavelink_node_ready(
+        self, payload: wavelink.NodeReadyEventPayload
+    ) -> None:
+        if self.store is not None and self._restore_task is None:
+            self._restore_task = asyncio.create_task(self._restore())
+
+        if not payload.resumed:
+            # A new session, Lavalink has forgotten the players it had
+            since = self._down_since.pop(payload.node.identifier, time.monotonic())
+            for player in self.bot.voice_clients:
+                if isinstance(player, Player) and player.node is payload.node:
+                    self._migrate(player, since=since, lost=True)
+
+    @commands.Cog.listener(name="on_wavelink_node_closed")
+    async def _on_wavelink_node_closed(
+        self, node: wavelink.Node, players: typing.List[Player]
+    ) -> None:
+        since = self._down_since.get(node.identifier, time.monotonic())
+        for player in players:
+            if player.guild.voice_client is player:
+                self._migrate(player, since=since, lost=True)
+
+    async def _watch_nodes(self) -> None:
+        """Move players off nodes that have been down for a while, or are being drained"""
+        interval = self._migration.get("interval", 2.0)
+        grace = self._migration.get("grace", 5.0)
+
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+
+            for node in wavelink.Pool.nodes.values():
+                if node.status is wavelink.NodeStatus.CONNECTED:
+                    self._down_since.pop(node.identifier, None)
+                else:
+                    self._down_since.setdefault(node.identifier, now)
+
+            moves = []
+            for player in self.bot.voice_clients:
+                if not isinstance(player, Player):
+                    continue
+
+                identifier = player.node.identifier
+                down = self._down_since.get(identifier)
+                if down is not None and now - down >= grace:
+                    moves.append((player, down, True))
+                elif identifier in self.bot.nodes.draining:
+                    moves.append((player, now, False))
+
+            if moves and not self.bot.nodes.playable:
+                # Nowhere to move them, wait for a node to come back
+                if not self._stranded:
+                    self.logger.warning(
+                        f"No playback node to move {len(moves)} players to, waiting for one"
+                    )
+                self._stranded = True
+                continue
+
+            self._stranded = False
+            for player, since, lost in moves:
+                self._migrate(player, since=since, lost=lost)
+
+    def _migrate(self, player: Player, *, since: float, lost: bool = False) -> None:
+        guild_id = player.guild.id
+        if guild_id not in self._migrating:
+            task = asyncio.create_task(self._migrate_player(player, since, lost))
+            self._migrating[guild_id] = task
+            task.add_done_callback(lambda _: self._migrating.pop(guild_id, None))
+
+    async def _migrate_player(self, player: Player, since: float, lost: bool) -> None:
+        # Moving every player of a node at once would flood the new node
+        await self._migration_bucket.acquire()
+
+        if player.guild.voice_client is not player:
+            return
+
+        old = player.node
+        try:
+            node = self.bot.nodes.best(getattr(player.channel, "rtc_region", None))
+            await player.migrate(node, lost=lost)
+        except Exception as e:
+            # Tried again on the next check while the node is still down or draining
+            self.logger.error(
+                f"Couldn't move the player in guild {player.guild.id} off node {old.identifier}",
+                exc_info=(type(e), e, e.__traceback__),
+            )
+            return
+
+        recovered = time.monotonic() - since
+        player.recoveries.observe(recovered)
+        self._changed(player.guild.id)
+        self.logger.info(
+            f"{player.guild.name} ({player.guild.id}) Moved from node {old.identifier} to {node.identifier}, playing again after {recovered:.2f}s"
+        )
+
+    async def _restore(self) -> None:
+        """Reconnect the players saved before the last restart"""
+        await self.bot.wait_until_ready()
+        start = time.perf_counter()
+
+        guilds = [guild.id for guild in self.bot.guilds if guild.voice_client is None]
+        states = await self.store.load(
+            guilds, max_age=self._persistence.get("max_age", 86400)
+        )
+
+        # Joining a voice channel is a gateway command, don't send a burst of them
+        bucket = RateLimitBucket(
+            self._persistence.get("rate", 5), self._persistence.get("per", 5.0)
+        )
+        semaphore = asyncio.Semaphore(self._persistence.get("concurrency", 10))
+
+        results = await asyncio.gather(
+            *(
+                self._restore_player(guild_id, state, bucket, semaphore)
+                for guild_id, state in states
+            ),
+            return_exceptions=True,
+        )
+
+        restored = 0
+        for (guild_id, _), result in zip(states, results):
+            if isinstance(result, Exception):
+                self.logger.error(
+                    f"Couldn't restore the player in guild {guild_id}",
+                    exc_info=(type(result), result, result.__traceback__),
+                )
+                self._changed(guild_id)
+            elif result:
+                restored += 1
+
+        self.logger.info(
+            f"Restored {restored}/{len(states)} players in {time.perf_counter() - start:.2f}s"
+        )
+
+    async def _restore_player(
+        self,
+        guild_id: int,
+        state: typing.Dict[str, typing.Any],
+        bucket: RateLimitBucket,
+        semaphore: asyncio.Semaphore,
+    ) -> bool:
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel(state["channel"]) if guild else None
+
+        if (
+            not isinstance(channel, discord.VoiceChannel)
+            or guild.voice_client is not None
+            or not channel.permissions_for(guild.me).connect
+            or not any(not member.bot for member in channel.members)
+        ):
+            # Nobody to play to, forget it
+            self._changed(guild_id)
+            return False
+
+        async with semaphore:
+            await bucket.acquire()
+
+            self._restoring.add(guild_id)
+            try:
+                player: Player = await channel.connect(self_deaf=True, cls=Player)
+                try:
+                    await player.restore(state)
+                except BaseException:
+                    await player.disconnect()
+                    raise
+            finally:
+                self._restoring.discard(guild_id)
+
+        if message := state.get("message"):
+            self._now_playing(player).adopt(channel.get_partial_message(message))
+
+        return True
+
+    def _cleanup(self, guild: discord.Guild) -> None:
+        self._changed(guild.id)
+        self._idle.disarm(guild.id)
+
+        state = self.bot.guild_states.evict(guild.id)
+        if state is not None and (controller := state.now_playing) is not None:
+            self.logger.debug(
+                f"{guild.name} ({guild.id}) Now playing sent {controller.requests} requests for {controller.updates} updates"
+            )
 
     @app_commands.guild_only()
     @app_commands.command(name="join")
@@ -333,12 +696,7 @@ class Music(Cog):
 
         channel: discord.VoiceChannel = interaction.guild.voice_client.channel
         await interaction.guild.voice_client.disconnect()
-        task = self._tasks.get(channel.id, None)
-        if task:
-            self.logger.debug(
-                f"Cleaning up waiters in {channel.guild.name} ({channel.guild.id})"
-            )
-            task.cancel()
+        self._cleanup(interaction.guild)
         await interaction.response.send_message(
             embed=SuccessEmbed(f"Disconnected from {channel.mention}")
         )
@@ -363,27 +721,98 @@ class Music(Cog):
             raise UserNotInVoiceChannel
 
         if not interaction.guild.voice_client:
-            player: wavelink.Player = await interaction.user.voice.channel.connect(
-                self_deaf=True, cls=wavelink.Player
+            player: Player = await interaction.user.voice.channel.connect(
+                self_deaf=True, cls=Player
             )
 
         player: Player = interaction.guild.voice_client
+        if isinstance(playable, wavelink.Playlist):
+            return await self._enqueue(interaction, player, playable)
+
         if isinstance(playable, list):
             playable = playable[0]
         player.queue.put(playable)
-
-        if isinstance(playable, wavelink.Playlist):
-            title = playable.name
-            url = playable.url
-        else:
-            title = playable.title
-            url = playable.uri
+        await self._queued(player)
 
         await interaction.followup.send(
-            embed=SuccessEmbed(f"Added {hyperlink(title, url)} to the queue"),
+            embed=SuccessEmbed(
+                f"Added {hyperlink(playable.title, playable.uri)} to the queue"
+            ),
+            ephemeral=True,
+        )
+
+    async def _enqueue(
+        self,
+        interaction: discord.Interaction,
+        player: Player,
+        playlist: wavelink.Playlist,
+    ) -> None:
+        """Queue the first track of a playlist now and the rest in the background
+
+        Playback can start as soon as the first track is queued, however long
+        the playlist is.
+        """
+        tracks = playlist.tracks
+        name = hyperlink(playlist.name, playlist.url)
+
+        if not tracks:
+            raise app_commands.TransformerError(
+                playlist.name,
+                discord.AppCommandOptionType.string,
+                PlayableTransformer(),
+            )
+
+        player.queue.put(tracks[0])
+        await self._queued(player)
+
+        message = await interaction.followup.send(
+            embed=NeutralEmbed(f"Adding {len(tracks)} tracks from {name}…"),
             ephemeral=True,
+            wait=True,
         )
 
+        task = asyncio.create_task(self._enqueue_rest(player, tracks, name, message))
+        tasks = self.bot.guild_states.state(player.guild.id).enqueues
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def _enqueue_rest(
+        self,
+        player: Player,
+        tracks: typing.List[wavelink.Playable],
+        name: str,
+        message: discord.WebhookMessage,
+    ) -> None:
+        total = len(tracks)
+        # Report progress a few times, not per chunk
+        step = max(self._enqueue_chunk, -(-total // self._enqueue_updates))
+        report = step
+
+        for start in range(1, total, self._enqueue_chunk):
+            # Let playback and other guilds run between chunks
+            await asyncio.sleep(0)
+
+            if player.guild.voice_client is not player:
+                return
+
+            end = min(start + self._enqueue_chunk, total)
+            player.queue.put(tracks[start:end])
+            self._changed(player.guild.id)
+
+            if report <= end < total:
+                report = end + step
+                with contextlib.suppress(discord.HTTPException):
+                    await message.edit(
+                        embed=NeutralEmbed(
+                            f"Adding {total} tracks from {name}… ({end}/{total})"
+                        )
+                    )
+
+        with contextlib.suppress(discord.HTTPException):
+            await message.edit(
+                embed=SuccessEmbed(f"Added {total} tracks from {name} to the queue")
+            )
+
     @app_commands.guild_only()
     @app_commands.command(name="pause")
     async def _pause(self, interaction: discord.Interaction) -> None:
@@ -413,6 +842,7 @@ class Music(Cog):
             raise AlreadyPaused
 
         await player.pause(True)
+        self._changed(player.guild.id)
         await interaction.response.send_message(
             embed=SuccessEmbed("Paused the player."), ephemeral=True
         )
@@ -446,6 +876,7 @@ class Music(Cog):
             raise NotPaused
 
         await player.pause(False)
+        self._changed(player.guild.id)
         await interaction.response.send_message(
             embed=SuccessEmbed("Resumed the player."), ephemeral=True
         )
@@ -453,11 +884,17 @@ class Music(Cog):
     queue = app_commands.Group(name="queue", description="Queue", guild_only=True)
 
     @queue.command(name="list")
-    async def _queue_list(self, interaction: discord.Interaction) -> None:
+    async def _queue_list(
+        self,
+        interaction: discord.Interaction,
+        page: typing.Optional[app_commands.Range[int, 1]] = None,
+    ) -> None:
         """Show the queue
 
         :param interaction: Interaction provided by discord
         :type interaction: discord.Interaction
+        :param page: Page to start on
+        :type page: typing.Optional[app_commands.Range[int, 1]], optional
         """
         if not interaction.guild.voice_client:
             raise BotNotInVoiceChannel
@@ -476,28 +913,12 @@ class Music(Cog):
 
         player: Player = interaction.guild.voice_client
 
-        current = player.current
-        queue = player.queue
-
-        if len(queue) == 0:
+        if len(player.queue) == 0:
             return await self._nowplaying.callback(self, interaction)
 
-        embed = NeutralEmbed(
-            title=f"{len(queue)} item{'s' if len(queue) != 1 else ''} in queue"
-        )
-        lines = []
-
-        lines.append(f"**Currently playing:** {hyperlink(current.title, current.uri)}")
-
-        for index, item in enumerate(list(queue)):
-            lines.append(f"{index+1}) {hyperlink(item.title, item.uri)}")
-            if len("\n".join(lines)) > 4096:
-                lines.pop()
-                break
-
-        embed.description = "\n".join(lines)
-
-        await interaction.response.send_message(embed=embed)
+        source = QueuePageSource(player)
+        index = min(page, source.page_count) - 1 if page else 0
+        await Paginator(source).start(interaction, index=index)
 
     @queue.command(name="remove")
     async def _queue_remove(
@@ -534,11 +955,18 @@ class Music(Cog):
 
         item = int(match.group(1)) - 1
 
-        removed = player.queue._queue[item]
-        await player.queue.delete(item)
+        if not 0 <= item < len(player.queue):
+            raise QueueItemMissing
+
+        removed = player.queue[item]
+        player.queue.delete(item)
+        self._changed(player.guild.id)
 
         await interaction.response.send_message(
-            embed=SuccessEmbed(f"Removed {removed} from the queue"), ephemeral=True
+            embed=SuccessEmbed(
+                f"Removed {hyperlink(removed.title, removed.uri)} from the queue"
+            ),
+            ephemeral=True,
         )
 
     @app_commands.guild_only()
@@ -571,7 +999,11 @@ class Music(Cog):
         if not current:
             raise NothingPlaying
 
-        await self._send_current_playing(interaction.response, player)
+        await interaction.response.send_message(embed=self._now_playing_embed(player))
+
+        controller = self._now_playing(player)
+        if interaction.channel_id == controller.channel.id:
+            controller.adopt(await interaction.original_response())
 
     @app_commands.guild_only()
     @app_commands.command(name="skip")
@@ -647,6 +1079,7 @@ class Music(Cog):
             player.queue.mode = m[player.queue.mode]
         else:
             player.queue.mode = sm[type_]
+        self._changed(player.guild.id)
 
         await interaction.response.send_message(
             embed=SuccessEmbed(
@@ -1,22 +1,52 @@
 import asyncio
 import asyncpg
 import logging
+import os
+import socket
 import typing
 import datetime
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord.ext.commands import Cog
 from subclasses.bot import Bot
 
+from .utils.claims import (
+    CLAIM_COLUMNS,
+    CLAIM_REMINDER,
+    CLAIM_REMINDERS,
+    HAS_CLAIM_COLUMNS,
+    RELEASE_REMINDERS,
+)
+from .utils.delivery import DeliveryPipeline
+from .utils.listener import Listener
+from .utils.scheduler import Scheduler
 from .utils.transformer import DatetimeTransformer
 from .utils.embed import ErrorEmbed, SuccessEmbed, NeutralEmbed
+from .utils.view import PageSource, Paginator
 from .utils import hyperlink
 
 
 UTC_ADJUST = 86400  # TODO: Detect automagically
 
+INSERT_REMINDER = """
+INSERT INTO reminder (member, reason, channel, created, due)
+VALUES ($1, $2, $3, $4, $5)
+RETURNING *
+"""
+
+# Creates the user (if needed) and the reminder in a single round trip.
+# Foreign keys are checked at the end of the statement, after the CTE has run.
+INSERT_USER_AND_REMINDER = """
+WITH _user AS (
+    INSERT INTO public.user VALUES ($1) ON CONFLICT DO NOTHING
+)
+INSERT INTO reminder (member, reason, channel, created, due)
+VALUES ($1, $2, $3, $4, $5)
+RETURNING *
+"""
+
 
 class ReminderException(app_commands.AppCommandError):
     """Base class for reminder exceptions"""
@@ -30,12 +60,145 @@ class NoReminders(ReminderException):
     """You do not have any reminders set!"""
 
 
+class ReminderPageSource(PageSource):
+    """Keyset-paginated reminders of a member
+
+    Only the (due, id) cursor each visited page starts after is kept, so every
+    page costs one indexed query no matter how many reminders there are.
+    """
+
+    def __init__(self, bot: Bot, member: int, count: int, *, per_page: int = 10):
+        self.bot = bot
+        self.member = member
+        self.count = count
+        self.per_page = per_page
+
+        self._cursors: typing.List[
+            typing.Optional[typing.Tuple[datetime.datetime, int]]
+        ] = [None]
+        self._last: typing.Optional[int] = None
+
+    def has_page(self, index: int) -> bool:
+        if index < 0:
+            return False
+        if self._last is not None:
+            return index <= self._last
+        return index < len(self._cursors)
+
+    async def get_page(self, index: int) -> discord.Embed:
+        cursor = self._cursors[index]
+
+        async with self.bot.acquire() as connection:
+            if cursor is None:
+                rows = await connection.fetch(
+                    "SELECT id, reason, due FROM reminder WHERE member = $1 ORDER BY due, id LIMIT $2",
+                    self.member,
+                    self.per_page + 1,
+                )
+            else:
+                rows = await connection.fetch(
+                    "SELECT id, reason, due FROM reminder WHERE member = $1 AND (due, id) > ($2, $3) ORDER BY due, id LIMIT $4",
+                    self.member,
+                    *cursor,
+                    self.per_page + 1,
+                )
+
+        lines = []
+        length = 0
+
+        for r in rows[: self.per_page]:
+            reason = r["reason"]
+            if len(reason) > 256:
+                reason = reason[:255] + "…"
+
+            line = (
+                f"{discord.utils.format_dt(r['due'], 'R')}) {reason} (ID: `{r['id']}`)"
+            )
+
+            # +1 for the newline joining it to the previous line
+            if lines and length + len(line) + 1 > 4096:
+                break
+
+            lines.append(line)
+            length += len(line) + (1 if len(lines) > 1 else 0)
+
+        more = len(lines) < len(rows)
+        if more and len(self._cursors) == index + 1:
+            last = rows[len(lines) - 1]
+            self._cursors.append((last["due"], last["id"]))
+        elif not more:
+            self._last = index
+
+        embed = NeutralEmbed(
+            title=f"{self.count} reminder{'s' if self.count != 1 else ''} set"
+        )
+        embed.description = "\n".join(lines)
+        embed.set_footer(text=f"Page {index + 1}")
+
+        return embed
+
+
 class Reminder(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
         self.logger = logging.getLogger("discord.bot.plugins.Reminder")
 
-        self._reminder_loop.start()
+        config = self.bot.config.get("reminder", {})
+        self.pipeline = DeliveryPipeline(
+            self._deliver_reminder,
+            self._complete_reminders,
+            lambda reminder, delay: self.scheduler.retry(reminder, delay),
+            key=lambda reminder: reminder["channel"],
+            concurrency=config.get("concurrency", 16),
+            rate=config.get("channel_rate", 5),
+            per=config.get("channel_per", 5.0),
+            backoff=config.get("retry_backoff", 5.0),
+            max_backoff=config.get("max_retry_backoff", 300.0),
+            max_attempts=config.get("max_attempts", 10),
+        )
+        self.scheduler = Scheduler(
+            self._load_reminders,
+            self.pipeline.submit,
+            horizon=config.get("horizon", 600),
+            max_loaded=config.get("max_loaded", 10000),
+        )
+
+        coordination = config.get("coordination", {})
+        self.coordinated: bool = coordination.get("enabled", False)
+        self.instance: str = coordination.get(
+            "instance", f"{socket.gethostname()}:{os.getpid()}"
+        )
+        self.lease = datetime.timedelta(seconds=coordination.get("lease", 120))
+        self.listener: typing.Optional[Listener] = None
+        self._tasks: typing.Set[asyncio.Task] = set()
+
+    async def cog_load(self) -> None:
+        if self.coordinated:
+            async with self.bot.acquire() as connection:
+                if not await connection.fetchval(HAS_CLAIM_COLUMNS):
+                    self.logger.info("Adding the claim columns to reminder")
+                    await connection.execute(CLAIM_COLUMNS)
+            self.listener = Listener(
+                self.bot.database,
+                "reminder",
+                self._on_notification,
+                on_reconnect=self.scheduler.reload,
+            )
+            await self.listener.start()
+            self.logger.info(f"Coordinating reminders as {self.instance!r}")
+
+        self.pipeline.start()
+        self.scheduler.start()
+
+    async def cog_unload(self) -> None:
+        self.scheduler.stop()
+        await self.pipeline.close()
+
+        if self.listener:
+            await self.listener.stop()
+            # Hand what we hold back straight away instead of waiting for the leases to expire
+            async with self.bot.acquire() as connection:
+                await connection.execute(RELEASE_REMINDERS, self.instance)
 
     async def cog_app_command_error(
         self, interaction: discord.Interaction, error: app_commands.AppCommandError
@@ -67,49 +230,86 @@ class Reminder(Cog):
 
     reminder = app_commands.Group(name="reminder", description="Reminders")
 
-    @tasks.loop(minutes=1)
-    async def _reminder_loop(self):
-        now = datetime.datetime.now(datetime.timezone.utc)
-        due_before = now + datetime.timedelta(minutes=1)
-
-        reminders = await self.bot.database.fetch(
-            "SELECT * FROM reminder WHERE due < $1", due_before
-        )
-
-        for reminder in reminders:
-            await self._execute_reminder(now, reminder)
-
-    @commands.Cog.listener(name="on_reminder_created")
-    async def _on_reminder_created(self, reminder: asyncpg.protocol.Record) -> None:
-        now = datetime.datetime.now(datetime.timezone.utc)
-        sleep = (reminder["due"] - now).seconds
+    async def _load_reminders(
+        self, until: datetime.datetime, limit: int
+    ) -> typing.List[asyncpg.Record]:
+        async with self.bot.acquire() as connection:
+            if not self.coordinated:
+                return await connection.fetch(
+                    "SELECT * FROM reminder WHERE due < $1 ORDER BY due LIMIT $2",
+                    until,
+                    limit,
+                )
 
-        if sleep < 60:
-            await self._execute_reminder(now, reminder)
+            reminders = await connection.fetch(
+                CLAIM_REMINDERS, until, self.instance, limit, until + self.lease
+            )
+        return sorted(reminders, key=lambda r: (r["due"], r["id"]))
+
+    def _on_notification(self, payload: str) -> None:
+        action, _, data = payload.partition(":")
+
+        if action == "deleted":
+            self.scheduler.remove(int(data))
+            self.pipeline.forget(int(data))
+
+        elif action == "created":
+            id, _, due = data.partition(":")
+            until = self.scheduler.loaded_until
+            if until is None or float(due) >= until.timestamp():
+                # Not within our horizon, whoever loads it first will claim it
+                return
+
+            task = asyncio.create_task(self._claim_reminder(int(id), until))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _claim_reminder(self, id: int, until: datetime.datetime) -> None:
+        async with self.bot.acquire() as connection:
+            reminder = await connection.fetchrow(
+                CLAIM_REMINDER, id, self.instance, until + self.lease
+            )
+        if reminder:
+            self.scheduler.add(reminder)
 
-    async def _execute_reminder(
-        self, now: datetime.datetime, reminder: asyncpg.protocol.Record
-    ) -> None:
+    async def _deliver_reminder(self, reminder: asyncpg.Record) -> bool:
         await self.bot.wait_until_ready()
-        sleep = (reminder["due"] - now).seconds
-
-        await asyncio.sleep(sleep)
 
         channel: typing.Optional[
             typing.Union[discord.TextChannel, discord.VoiceChannel]
-        ] = await self.bot.fetch_channel(reminder["channel"])
+        ] = await self.bot.resolver.channel(reminder["channel"])
 
+        owner: typing.Optional[discord.Member] = None
         if channel:
-            owner: typing.Optional[discord.Member] = await channel.guild.fetch_member(
-                reminder["member"]
+            owner = await self.bot.resolver.member(channel.guild, reminder["member"])
+
+        if not owner:
+            # This reminder can never be delivered, don't retry it forever
+            self.logger.debug(f"Dropping undeliverable reminder {reminder['id']}")
+            return False
+
+        try:
+            await channel.send(
+                f"{owner.mention}, {discord.utils.format_dt(reminder['created'], 'R')}\n{reminder['reason']}"
             )
-            if owner:
-                await channel.send(
-                    f"{owner.mention}, {discord.utils.format_dt(reminder['created'], 'R')}\n{reminder['reason']}"
-                )
-                await self.bot.database.execute(
-                    "DELETE FROM reminder WHERE id = $1", reminder["id"]
-                )
+        except discord.Forbidden:
+            self.logger.debug(f"Missing access to deliver reminder {reminder['id']}")
+            return False
+        except discord.HTTPException as e:
+            if e.status == 429 or e.status >= 500:
+                raise
+            # Rejected outright, e.g. the reason is too long, it won't get better
+            self.logger.debug(f"Dropping rejected reminder {reminder['id']}: {e}")
+            return False
+
+        return True
+
+    async def _complete_reminders(self, ids: typing.List[int]) -> None:
+        async with self.bot.acquire() as connection:
+            await connection.execute(
+                "DELETE FROM reminder WHERE id = ANY($1::bigint[])", ids
+            )
+        self.scheduler.release(*ids)
 
     @reminder.command(name="create")
     async def _reminder_create(
@@ -128,10 +328,8 @@ class Reminder(Cog):
         :type message: typing.Optional[str]
         """
         await interaction.response.defer(thinking=True, ephemeral=True)
-        await self.bot.ensure_user(interaction.user.id)
 
-        r = await self.bot.database.fetchrow(
-            "INSERT INTO reminder (member, reason, channel, created, due) VALUES ($1, $2, $3, $4, $5) RETURNING *",
+        args = (
             interaction.user.id,
             message,
             interaction.channel_id,
@@ -139,11 +337,28 @@ class Reminder(Cog):
             datetime,
         )
 
+        async with self.bot.acquire() as connection:
+            if self.bot.known_users.get(interaction.user.id):
+                try:
+                    r = await connection.fetchrow(INSERT_REMINDER, *args)
+                except asyncpg.ForeignKeyViolationError:
+                    # The user row went away behind our back, forget about them
+                    self.bot.known_users.pop(interaction.user.id)
+                    r = await connection.fetchrow(INSERT_USER_AND_REMINDER, *args)
+            else:
+                r = await connection.fetchrow(INSERT_USER_AND_REMINDER, *args)
+
+        self.bot.known_users.put(interaction.user.id, True)
+
         await interaction.followup.send(
             f"Ok, {discord.utils.format_dt(r['due'], 'R')}: {r['reason']} (ID: `{r['id']}`)",
             ephemeral=True,
         )
 
+        if self.listener:
+            await self.listener.notify(f"created:{r['id']}:{r['due'].timestamp()}")
+        else:
+            self.scheduler.add(r)
         self.bot.dispatch("reminder_created", r)
 
     @reminder.command(name="delete")
@@ -156,14 +371,20 @@ class Reminder(Cog):
         :type id: int
         """
         await interaction.response.defer(thinking=True, ephemeral=True)
-        r = await self.bot.database.fetchrow(
-            "DELETE FROM reminder WHERE id = $1 AND member = $2 RETURNING *",
-            id,
-            interaction.user.id,
-        )
+        async with self.bot.acquire() as connection:
+            r = await connection.fetchrow(
+                "DELETE FROM reminder WHERE id = $1 AND member = $2 RETURNING *",
+                id,
+                interaction.user.id,
+            )
         if not r:
             raise ReminderDoesntExist
         else:
+            if self.listener:
+                await self.listener.notify(f"deleted:{r['id']}")
+            else:
+                self.scheduler.remove(r["id"])
+                self.pipeline.forget(r["id"])
             await interaction.followup.send(
                 embed=SuccessEmbed(f"Deleted reminder {r['id']} ({r['reason']})"),
                 ephemeral=True,
@@ -177,29 +398,21 @@ class Reminder(Cog):
         :type interaction: discord.Interaction
         """
         await interaction.response.defer(thinking=True, ephemeral=True)
-        reminders = await self.bot.database.fetch(
-            "SELECT id, reason, due FROM reminder WHERE member = $1",
-            interaction.user.id,
-        )
-        if not reminders:
+        async with self.bot.acquire() as connection:
+            count = await connection.fetchval(
+                "SELECT count(*) FROM reminder WHERE member = $1",
+                interaction.user.id,
+            )
+        if not count:
             raise NoReminders
         else:
-            embed = NeutralEmbed(
-                title=f"{len(reminders)} reminder{'s' if len(reminders) != 1 else ''} set"
+            source = ReminderPageSource(
+                self.bot,
+                interaction.user.id,
+                count,
+                per_page=self.bot.config.get("reminder", {}).get("per_page", 10),
             )
-            lines = []
-
-            for r in reminders:
-                lines.append(
-                    f"{discord.utils.format_dt(r['due'], 'R')}) {r['reason']} (ID: `{r['id']}`)"
-                )
-                if len("\n".join(lines)) > 4096:
-                    lines.pop()
-                    break
-
-            embed.description = "\n".join(lines)
-
-            await interaction.followup.send(embed=embed, ephemeral=True)
+            await Paginator(source).start(interaction, ephemeral=True)
 
 
 async def setup(bot: Bot):
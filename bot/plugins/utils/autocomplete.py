@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import typing
+
+import discord
+
+from .cache import TTLCache
+
+T = typing.TypeVar("T")
+Key = typing.Tuple[int, typing.Optional[str]]
+
+
+class AutocompleteCoordinator:
+    """Run at most one autocomplete search per user and command
+
+    Discord sends an autocomplete request for every character typed. Each
+    request waits ``quiet`` seconds before searching, and a newer request from
+    the same user for the same command cancels the older one, whether it is
+    still waiting or already searching. A cancelled request answers with the
+    last result that request key completed instead.
+
+    :param quiet: Seconds without a newer request before searching, defaults to 0.3
+    :type quiet: float, optional
+    :param capacity: Maximum last results to remember, defaults to 10000
+    :type capacity: int, optional
+    :param ttl: Seconds to remember a last result, defaults to 120
+    :type ttl: float, optional
+    """
+
+    def __init__(
+        self, *, quiet: float = 0.3, capacity: int = 10000, ttl: float = 120
+    ) -> None:
+        self.quiet = quiet
+
+        self._tasks: typing.Dict[Key, asyncio.Task] = {}
+        self._last: TTLCache[Key, typing.Any] = TTLCache(capacity, ttl)
+
+        # Requests that searched to completion, and ones a newer request replaced
+        self.completed = 0
+        self.superseded = 0
+
+        self.logger = logging.getLogger("discord.bot.autocomplete")
+
+    def __str__(self) -> str:
+        return (
+            f"pending={len(self._tasks)} completed={self.completed} "
+            f"superseded={self.superseded}"
+        )
+
+    @staticmethod
+    def key(interaction: discord.Interaction) -> Key:
+        command = interaction.command
+        return interaction.user.id, command.qualified_name if command else None
+
+    async def _debounce(self, search: typing.Callable[[], typing.Awaitable[T]]) -> T:
+        if self.quiet > 0:
+            await asyncio.sleep(self.quiet)
+        return await search()
+
+    async def run(
+        self,
+        interaction: discord.Interaction,
+        search: typing.Callable[[], typing.Awaitable[T]],
+        default: T,
+    ) -> T:
+        """Run ``search`` unless a newer request for the same key arrives first
+
+        :param interaction: The autocomplete interaction
+        :type interaction: discord.Interaction
+        :param search: Coroutine function producing the result
+        :type search: typing.Callable[[], typing.Awaitable[T]]
+        :param default: Returned if cancelled before any search completed
+        :type default: T
+        :return: The result of ``search``, or the last good result if superseded
+        :rtype: T
+        """
+        key = self.key(interaction)
+
+        previous = self._tasks.get(key)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            self.superseded += 1
+
+        task = self._tasks[key] = asyncio.create_task(self._debounce(search))
+
+        try:
+            # Wait rather than await, so a superseded task doesn't cancel this one
+            await asyncio.wait((task,))
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+        if task.cancelled():
+            return self._last.get(key, default)
+
+        result = task.result()
+        self._last.put(key, result)
+        self.completed += 1
+        return result
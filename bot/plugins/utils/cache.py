@@ -0,0 +1,150 @@
+import time
+import typing
+from collections import OrderedDict
+
+K = typing.TypeVar("K")
+V = typing.TypeVar("V")
+
+
+class LRUCache(typing.Generic[K, V]):
+    """A bounded mapping that evicts the least recently used key when full
+
+    Lookups through :meth:`get` are counted in :attr:`hits` and :attr:`misses`.
+
+    :param capacity: Maximum number of keys
+    :type capacity: int
+    :param max_weight: Maximum total weight of the values, defaults to None
+    :type max_weight: typing.Optional[int], optional
+    :param weigh: Returns the weight (e.g. approximate size in bytes) of a value, defaults to None
+    :type weigh: typing.Optional[typing.Callable[[V], int]], optional
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        *,
+        max_weight: typing.Optional[int] = None,
+        weigh: typing.Optional[typing.Callable[[V], int]] = None,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be greater than 0")
+
+        self.capacity = capacity
+        self.max_weight = max_weight
+        self._weigh = weigh
+
+        self._data: OrderedDict[K, typing.Any] = OrderedDict()
+        self._weights: typing.Dict[K, int] = {}
+        self.weight = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __str__(self) -> str:
+        return (
+            f"size={len(self._data)}/{self.capacity} hits={self.hits} "
+            f"misses={self.misses} hit_ratio={self.hit_ratio:.2%}"
+        )
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _value(self, item: typing.Any) -> V:
+        # Subclasses may store more than the value itself
+        return item
+
+    def _discard(self, key: K) -> typing.Any:
+        self.weight -= self._weights.pop(key, 0)
+        return self._data.pop(key)
+
+    def get(self, key: K, default: typing.Optional[V] = None) -> typing.Optional[V]:
+        try:
+            item = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return self._value(item)
+
+    def _put(self, key: K, item: typing.Any) -> None:
+        if key in self._data:
+            self._discard(key)
+
+        self._data[key] = item
+        if self._weigh is not None:
+            weight = self._weigh(self._value(item))
+            self._weights[key] = weight
+            self.weight += weight
+
+        while len(self._data) > self.capacity or (
+            self.max_weight is not None
+            and self.weight > self.max_weight
+            and len(self._data) > 1
+        ):
+            self._discard(next(iter(self._data)))
+
+    def put(self, key: K, value: V) -> None:
+        self._put(key, value)
+
+    def pop(self, key: K, default: typing.Optional[V] = None) -> typing.Optional[V]:
+        if key not in self._data:
+            return default
+        return self._value(self._discard(key))
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._weights.clear()
+        self.weight = 0
+
+
+class TTLCache(LRUCache[K, V]):
+    """An :class:`LRUCache` whose entries also expire ``ttl`` seconds after being put
+
+    Expired entries are dropped when they are next looked up, or evicted like
+    any other entry once the cache is full.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        ttl: float,
+        *,
+        max_weight: typing.Optional[int] = None,
+        weigh: typing.Optional[typing.Callable[[V], int]] = None,
+    ) -> None:
+        super().__init__(capacity, max_weight=max_weight, weigh=weigh)
+        self.ttl = ttl
+
+    def _value(self, item: typing.Tuple[float, V]) -> V:
+        return item[1]
+
+    def __contains__(self, key: K) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[0] > time.monotonic()
+
+    def get(self, key: K, default: typing.Optional[V] = None) -> typing.Optional[V]:
+        item = self._data.get(key)
+
+        if item is None or item[0] <= time.monotonic():
+            if item is not None:
+                self._discard(key)
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key: K, value: V, *, ttl: typing.Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._put(key, (expires, value))
@@ -0,0 +1,48 @@
+# Multi-instance coordination: reminders are leased to one instance at a time.
+# A lease is renewed on every load and expires if its owner goes away.
+
+# Whether the claim columns exist, so the ALTER TABLE below and the lock it
+# takes only happen once
+HAS_CLAIM_COLUMNS = """
+SELECT count(*) = 2 FROM pg_attribute
+WHERE attrelid = 'reminder'::regclass
+  AND attname IN ('claimed_by', 'claimed_until')
+  AND NOT attisdropped
+"""
+
+CLAIM_COLUMNS = """
+ALTER TABLE reminder
+    ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+    ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ
+"""
+
+CLAIM_REMINDERS = """
+WITH claimable AS (
+    SELECT id FROM reminder
+    WHERE due < $1
+      AND (claimed_by = $2 OR claimed_until IS NULL OR claimed_until < now())
+    ORDER BY due, id
+    LIMIT $3
+    FOR UPDATE SKIP LOCKED
+)
+UPDATE reminder SET claimed_by = $2, claimed_until = $4
+FROM claimable
+WHERE reminder.id = claimable.id
+RETURNING reminder.*
+"""
+
+CLAIM_REMINDER = """
+UPDATE reminder SET claimed_by = $2, claimed_until = $3
+WHERE id = (
+    SELECT id FROM reminder
+    WHERE id = $1
+      AND (claimed_by = $2 OR claimed_until IS NULL OR claimed_until < now())
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING *
+"""
+
+RELEASE_REMINDERS = """
+UPDATE reminder SET claimed_by = NULL, claimed_until = NULL
+WHERE claimed_by = $1
+"""
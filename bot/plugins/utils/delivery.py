@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import time
+import typing
+
+from .metrics import Summary
+
+Entry = typing.Mapping[str, typing.Any]
+
+
+class RateLimitBucket:
+    """Token bucket allowing ``rate`` acquisitions every ``per`` seconds"""
+
+    def __init__(self, rate: int, per: float) -> None:
+        self.rate = rate
+        self.per = per
+
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.rate, self._tokens + (now - self._updated) * self.rate / self.per
+        )
+        self._updated = now
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self._tokens >= self.rate and not self._lock.locked()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) * self.per / self.rate)
+                self._refill()
+
+            self._tokens -= 1
+
+
+class DeliveryPipeline:
+    """Deliver due entries concurrently and remove finished ones in batches
+
+    Each entry waits for a token from the bucket of its key (e.g. its channel),
+    then for one of ``concurrency`` delivery slots. ``deliver`` returns whether
+    the entry was delivered or dropped, e.g. because its channel is gone, either
+    way it is finished with and its id is passed to ``complete`` in batches.
+    Entries whose delivery raised are handed to ``retry`` with a delay that
+    doubles from ``backoff`` on every failure, up to ``max_backoff``, and are
+    dropped like any other once ``max_attempts`` deliveries of them failed.
+
+    :param deliver: Coroutine delivering an entry, returning False if it was dropped
+    :type deliver: typing.Callable[[Entry], typing.Awaitable[bool]]
+    :param complete: Coroutine removing a batch of finished ids
+    :type complete: typing.Callable[[typing.List[int]], typing.Awaitable[None]]
+    :param retry: Called with entries that failed to deliver and the seconds to wait before trying again
+    :type retry: typing.Callable[[Entry, float], None]
+    :param key: Rate-limit bucket key of an entry
+    :type key: typing.Callable[[Entry], typing.Hashable]
+    :param concurrency: Deliveries allowed at once, defaults to 16
+    :type concurrency: int, optional
+    :param rate: Deliveries allowed per bucket every ``per`` seconds, defaults to 5
+    :type rate: int, optional
+    :param per: Bucket window in seconds, defaults to 5.0
+    :type per: float, optional
+    :param batch_size: Finished ids that trigger an early flush, defaults to 100
+    :type batch_size: int, optional
+    :param batch_interval: Seconds between flushes, defaults to 1.0
+    :type batch_interval: float, optional
+    :param backoff: Seconds before the first retry, defaults to 5.0
+    :type backoff: float, optional
+    :param max_backoff: Most seconds between retries, defaults to 300.0
+    :type max_backoff: float, optional
+    :param max_attempts: Failed deliveries after which an entry is dropped, defaults to 10
+    :type max_attempts: int, optional
+    """
+
+    def __init__(
+        self,
+        deliver: typing.Callable[[Entry], typing.Awaitable[bool]],
+        complete: typing.Callable[[typing.List[int]], typing.Awaitable[None]],
+        retry: typing.Callable[[Entry, float], None],
+        *,
+        key: typing.Callable[[Entry], typing.Hashable],
+        concurrency: int = 16,
+        rate: int = 5,
+        per: float = 5.0,
+        batch_size: int = 100,
+        batch_interval: float = 1.0,
+        backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        max_attempts: int = 10,
+    ) -> None:
+        self._deliver = deliver
+        self._complete = complete
+        self._retry = retry
+        self._key = key
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._rate = rate
+        self._per = per
+        self._buckets: typing.Dict[typing.Hashable, RateLimitBucket] = {}
+
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._finished: typing.List[int] = []
+        self._flush_now = asyncio.Event()
+
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        # Entry id -> deliveries of it that failed in a row
+        self._failures: typing.Dict[int, int] = {}
+
+        self._tasks: typing.Set[asyncio.Task] = set()
+        self._flusher: typing.Optional[asyncio.Task] = None
+
+        # Seconds between an entry being due and it being delivered
+        self.lateness = Summary()
+
+        self.logger = logging.getLogger("discord.bot.delivery")
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def start(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+        for task in self._tasks:
+            task.cancel()
+
+        await self.flush()
+
+    def submit(self, entry: Entry) -> None:
+        task = asyncio.create_task(self._process(entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, entry: Entry) -> None:
+        key = self._key(entry)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = RateLimitBucket(self._rate, self._per)
+
+        try:
+            await bucket.acquire()
+            async with self._semaphore:
+                delivered = await self._deliver(entry)
+        except asyncio.CancelledError:
+            self._retry(entry, 0.0)
+            raise
+        except Exception as e:
+            failures = self._failures[entry["id"]] = (
+                self._failures.get(entry["id"], 0) + 1
+            )
+            if failures >= self.max_attempts:
+                self.logger.error(
+                    f"Delivery of {entry['id']} failed {failures} times, dropping it: {e}",
+                    exc_info=(type(e), e, e.__traceback__),
+                )
+                self._failures.pop(entry["id"], None)
+                self._finish(entry["id"])
+                return
+
+            delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+            self.logger.error(
+                f"Delivery of {entry['id']} failed {failures} times, retrying in {delay}s: {e}",
+                exc_info=(type(e), e, e.__traceback__),
+            )
+            self._retry(entry, delay)
+            return
+
+        self._failures.pop(entry["id"], None)
+
+        if delivered and (due := entry.get("due")):
+            self.lateness.observe(
+                (datetime.datetime.now(datetime.timezone.utc) - due).total_seconds()
+            )
+
+        self._finish(entry["id"])
+
+    def _finish(self, id: int) -> None:
+        self._finished.append(id)
+        if len(self._finished) >= self.batch_size:
+            self._flush_now.set()
+
+    def forget(self, id: int) -> None:
+        """Forget the failures of an entry that won't be retried, e.g. because it was deleted"""
+        self._failures.pop(id, None)
+
+    async def flush(self) -> None:
+        if not self._finished:
+            return
+
+        ids, self._finished = self._finished, []
+        try:
+            await self._complete(ids)
+        except Exception as e:
+            self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+            self._finished.extend(ids)
+            return
+
+        self.logger.debug(f"Completed {len(ids)} deliveries, lateness {self.lateness}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._flush_now.wait(), self.batch_interval)
+            self._flush_now.clear()
+
+            await self.flush()
+
+            for key in [k for k, b in self._buckets.items() if b.idle]:
+                del self._buckets[key]
@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import time
+import typing
+
+
+class IdleSweeper:
+    """Timeouts of idle players, expired by a single task
+
+    :meth:`arm` records when a key, e.g. a guild id, times out. Deadlines are
+    kept in a heap and one task sleeps until the earliest, so the number of
+    tasks and timers stays the same however many players are idle. Re-arming
+    or :meth:`disarm` leaves the old heap entry behind, it is skipped when it
+    comes up.
+
+    :param on_expire: Called with each key whose deadline passed
+    :type on_expire: typing.Callable[[typing.Hashable], None]
+    :param timeout: Seconds until a key expires, defaults to 300
+    :type timeout: float, optional
+    """
+
+    def __init__(
+        self,
+        on_expire: typing.Callable[[typing.Hashable], None],
+        *,
+        timeout: float = 300
+    ) -> None:
+        self._on_expire = on_expire
+        self.timeout = timeout
+
+        # (deadline, tie breaker, key)
+        self._heap: typing.List[typing.Tuple[float, int, typing.Hashable]] = []
+        self._deadlines: typing.Dict[typing.Hashable, float] = {}
+        self._counter = itertools.count()
+
+        self._wakeup = asyncio.Event()
+        self._task: typing.Optional[asyncio.Task] = None
+
+        self.expired = 0
+
+        self.logger = logging.getLogger("discord.bot.idle")
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._deadlines
+
+    def arm(self, key: typing.Hashable, timeout: typing.Optional[float] = None) -> None:
+        """Expire ``key`` after ``timeout`` seconds, replacing any earlier deadline"""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+
+        # Don't let entries left behind by re-arming pile up
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [
+                entry
+                for entry in self._heap
+                if self._deadlines.get(entry[2]) == entry[0]
+            ]
+            heapq.heapify(self._heap)
+
+        if self._heap[0][0] == deadline:
+            self._wakeup.set()
+
+    def disarm(self, key: typing.Hashable) -> bool:
+        """Forget ``key``
+
+        :return: Whether it was armed
+        :rtype: bool
+        """
+        return self._deadlines.pop(key, None) is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def _expire(self, now: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(heap)
+            if self._deadlines.get(key) != deadline:
+                continue
+
+            del self._deadlines[key]
+            self.expired += 1
+            try:
+                self._on_expire(key)
+            except Exception as e:
+                self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            self._expire(time.monotonic())
+
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
@@ -0,0 +1,113 @@
+import collections
+import heapq
+import itertools
+import re
+import typing
+
+WORD = re.compile(r"\w+")
+
+
+def trigrams(text: str, *, partial: bool = False) -> typing.FrozenSet[str]:
+    """Character trigrams of the words in ``text``
+
+    Words are casefolded and padded, so short words and word starts still
+    produce trigrams. ``partial`` leaves the end unpadded, for text that is
+    still being typed.
+    """
+    words = " ".join(WORD.findall(text.casefold()))
+    if not words:
+        return frozenset()
+
+    padded = f"  {words}" if partial else f"  {words} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """Fuzzy text search by shared character trigrams
+
+    Keys are added and discarded one at a time. A search only scores the
+    keys found through the query's rarest trigrams, up to ``max_candidates``,
+    so its cost doesn't grow with the number of keys.
+
+    :param max_candidates: Most keys to score per search, defaults to 2000
+    :type max_candidates: int, optional
+    """
+
+    def __init__(self, *, max_candidates: int = 2000) -> None:
+        self.max_candidates = max_candidates
+
+        self._postings: typing.DefaultDict[str, typing.Set[int]] = (
+            collections.defaultdict(set)
+        )
+        self._grams: typing.Dict[int, typing.FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._grams
+
+    def add(self, key: int, text: str) -> None:
+        if key in self._grams:
+            self.discard(key)
+
+        grams = self._grams[key] = trigrams(text)
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def discard(self, key: int) -> None:
+        grams = self._grams.pop(key, None)
+        if grams is None:
+            return
+
+        for gram in grams:
+            posting = self._postings[gram]
+            posting.discard(key)
+            if not posting:
+                del self._postings[gram]
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._grams.clear()
+
+    def search(
+        self, query: str, limit: int = 25
+    ) -> typing.List[typing.Tuple[float, int]]:
+        """Best matches for ``query``
+
+        :param query: Text being typed
+        :type query: str
+        :param limit: Maximum matches, defaults to 25
+        :type limit: int, optional
+        :return: ``(score, key)`` pairs, best first, scores are Dice coefficients in (0, 1]
+        :rtype: typing.List[typing.Tuple[float, int]]
+        """
+        grams = trigrams(query, partial=True)
+        postings = sorted(
+            (self._postings[g] for g in grams if g in self._postings), key=len
+        )
+        if not postings:
+            return []
+
+        candidates: typing.Set[int] = set()
+        for posting in postings:
+            room = self.max_candidates - len(candidates)
+            if room <= 0:
+                break
+            if len(posting) <= room:
+                candidates |= posting
+            else:
+                candidates.update(itertools.islice(posting, room))
+
+        size = len(grams)
+        return heapq.nlargest(
+            limit,
+            (
+                (
+                    2 * len(grams & self._grams[key]) / (size + len(self._grams[key])),
+                    key,
+                )
+                for key in candidates
+            ),
+            key=lambda match: (match[0], -match[1]),
+        )
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import typing
+
+import asyncpg
+
+
+class Listener:
+    """Keep a pooled connection LISTENing on a Postgres channel
+
+    The connection is re-acquired with a backoff whenever it is lost.
+    ``on_reconnect`` is called afterwards, since notifications sent in the
+    meantime are gone.
+
+    :param pool: Pool to take the connection from
+    :type pool: asyncpg.Pool
+    :param channel: Channel to listen on
+    :type channel: str
+    :param callback: Called with the payload of every notification
+    :type callback: typing.Callable[[str], None]
+    :param on_reconnect: Called after the connection was re-established, defaults to None
+    :type on_reconnect: typing.Optional[typing.Callable[[], None]], optional
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        channel: str,
+        callback: typing.Callable[[str], None],
+        *,
+        on_reconnect: typing.Optional[typing.Callable[[], None]] = None,
+    ) -> None:
+        self.pool = pool
+        self.channel = channel
+        self._callback = callback
+        self._on_reconnect = on_reconnect
+
+        self._connection: typing.Optional[asyncpg.Connection] = None
+        self._reconnect: typing.Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.logger = logging.getLogger("discord.bot.listener")
+
+    def _notified(
+        self, connection: asyncpg.Connection, pid: int, channel: str, payload: str
+    ) -> None:
+        try:
+            self._callback(payload)
+        except Exception as e:
+            self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+
+    def _terminated(self, connection: asyncpg.Connection) -> None:
+        if self._closed or connection is not self._connection:
+            return
+
+        self.logger.warning(f"Lost the connection listening on {self.channel!r}")
+        self._connection = None
+        self._reconnect = asyncio.create_task(self._run_reconnect(connection))
+
+    async def _listen(self) -> None:
+        connection = await self.pool.acquire()
+        try:
+            connection.add_termination_listener(self._terminated)
+            await connection.add_listener(self.channel, self._notified)
+        except BaseException:
+            await self.pool.release(connection)
+            raise
+
+        self._connection = connection
+
+    async def _run_reconnect(self, lost: asyncpg.Connection) -> None:
+        # Give the dead connection's slot back to the pool before taking another
+        try:
+            await self.pool.release(lost)
+        except Exception as e:
+            self.logger.debug(f"Could not release the lost connection: {e}")
+
+        delay = 1
+        while not self._closed:
+            try:
+                await self._listen()
+            except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as e:
+                self.logger.warning(f"Could not listen on {self.channel!r}: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            else:
+                self.logger.info(f"Listening on {self.channel!r} again")
+                if self._on_reconnect:
+                    self._on_reconnect()
+                return
+
+    async def start(self) -> None:
+        self._closed = False
+        await self._listen()
+
+    async def stop(self) -> None:
+        self._closed = True
+
+        if self._reconnect:
+            self._reconnect.cancel()
+            self._reconnect = None
+
+        if connection := self._connection:
+            self._connection = None
+            connection.remove_termination_listener(self._terminated)
+            if not connection.is_closed():
+                await connection.remove_listener(self.channel, self._notified)
+            await self.pool.release(connection)
+
+    async def notify(self, payload: str) -> None:
+        await self.pool.execute("SELECT pg_notify($1, $2)", self.channel, payload)
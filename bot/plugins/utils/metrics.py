@@ -0,0 +1,44 @@
+import typing
+from collections import deque
+
+
+class Summary:
+    """Running summary of observed values
+
+    Keeps totals over every observation and percentiles over a window of the
+    most recent ones.
+
+    :param window: How many recent observations to keep for percentiles, defaults to 1024
+    :type window: int, optional
+    """
+
+    def __init__(self, window: int = 1024) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+        self._recent: typing.Deque[float] = deque(maxlen=window)
+
+    def __str__(self) -> str:
+        return (
+            f"count={self.count} mean={self.mean:.3f} p50={self.percentile(50):.3f} "
+            f"p95={self.percentile(95):.3f} max={self.max:.3f}"
+        )
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value) if self.count > 1 else value
+        self._recent.append(value)
+
+    def percentile(self, q: float) -> float:
+        if not self._recent:
+            return 0.0
+
+        ordered = sorted(self._recent)
+        index = min(int(len(ordered) * q / 100), len(ordered) - 1)
+        return ordered[index]
@@ -0,0 +1,217 @@
+import asyncio
+import contextlib
+import logging
+import typing
+
+import wavelink
+import yarl
+
+SOURCES: typing.Dict[typing.Union[wavelink.TrackSource, str, None], str] = {
+    wavelink.TrackSource.YouTube: "ytsearch",
+    wavelink.TrackSource.YouTubeMusic: "ytmsearch",
+    wavelink.TrackSource.SoundCloud: "scsearch",
+}
+
+
+class NodeOptions:
+    """How a node is used, from its ``wavelink.nodes`` config entry
+
+    :param weight: Relative capacity, a node of weight 2 takes twice the load, defaults to 1.0
+    :type weight: float, optional
+    :param regions: Voice regions (``rtc_region``) the node is close to, defaults to ()
+    :type regions: typing.Iterable[str], optional
+    :param playback: Whether new players may be placed on it, defaults to True
+    :type playback: bool, optional
+    :param search: Whether searches may be sent to it, defaults to True
+    :type search: bool, optional
+    """
+
+    __slots__ = ("weight", "regions", "playback", "search")
+
+    def __init__(
+        self,
+        *,
+        weight: float = 1.0,
+        regions: typing.Iterable[str] = (),
+        playback: bool = True,
+        search: bool = True,
+    ) -> None:
+        self.weight = weight
+        self.regions = frozenset(regions)
+        self.playback = playback
+        self.search = search
+
+
+class NodeBalancer:
+    """Places players and spreads searches across Lavalink nodes
+
+    New players go to the node with the lowest :meth:`penalty`, preferring
+    nodes close to the voice channel's region. The penalty combines the
+    players on the node, its CPU load and the frames it failed to send,
+    from stats fetched every ``interval`` seconds, divided by its weight.
+
+    Searches are balanced separately, by the searches in flight on each
+    node, so a burst of autocomplete traffic doesn't steer players away
+    from a node, or pile onto the node hosting the most players.
+
+    Nodes in :attr:`draining` get no new players or searches.
+
+    :param interval: Seconds between stats refreshes, defaults to 30.0
+    :type interval: float, optional
+    """
+
+    def __init__(self, *, interval: float = 30.0) -> None:
+        self.interval = interval
+
+        self.options: typing.Dict[str, NodeOptions] = {}
+        self.stats: typing.Dict[str, wavelink.StatsResponsePayload] = {}
+        # Node identifier -> searches in flight
+        self._searching: typing.Dict[str, int] = {}
+        # Identifiers of nodes being emptied, e.g. for maintenance
+        self.draining: typing.Set[str] = set()
+
+        self._task: typing.Optional[asyncio.Task] = None
+
+        self.logger = logging.getLogger("discord.bot.nodes")
+
+    def add(self, node: wavelink.Node, options: NodeOptions) -> None:
+        self.options[node.identifier] = options
+
+    def _connected(self, role: str) -> typing.List[wavelink.Node]:
+        return [
+            node
+            for node in wavelink.Pool.nodes.values()
+            if node.status is wavelink.NodeStatus.CONNECTED
+            and node.identifier not in self.draining
+            and getattr(self._options(node), role)
+        ]
+
+    def _options(self, node: wavelink.Node) -> NodeOptions:
+        return self.options.get(node.identifier) or NodeOptions()
+
+    def penalty(self, node: wavelink.Node) -> float:
+        """Load of a node relative to its weight, lower is better"""
+        # Players placed since the last stats aren't counted by Lavalink yet
+        players = len(node.players)
+        load = 0.0
+
+        if stats := self.stats.get(node.identifier):
+            players = max(players, stats.playing)
+            # The curves used by Lavalink client libraries: negligible when
+            # idle, dominating once the CPU or audio falls behind
+            load += 1.05 ** (100 * stats.cpu.system_load) * 10 - 10
+            if frames := stats.frames:
+                load += 1.03 ** (500 * frames.deficit / 3000) * 600 - 600
+                load += (1.03 ** (500 * frames.nulled / 3000) * 300 - 300) * 2
+
+        return (players + load) / self._options(node).weight
+
+    @property
+    def playable(self) -> bool:
+        """Whether a node is connected that :meth:`best` can place players on"""
+        return bool(self._connected("playback"))
+
+    def best(self, region: typing.Optional[str] = None) -> wavelink.Node:
+        """The node a new player should be placed on
+
+        :param region: Voice region of the channel, defaults to None
+        :type region: typing.Optional[str], optional
+        :raises wavelink.InvalidNodeException: No node is connected
+        """
+        nodes = self._connected("playback")
+        if not nodes:
+            raise wavelink.InvalidNodeException("No playback nodes are connected.")
+
+        if region is not None:
+            local = [n for n in nodes if region in self._options(n).regions]
+            nodes = local or nodes
+
+        return min(nodes, key=self.penalty)
+
+    def search_node(self) -> wavelink.Node:
+        """The node with the fewest searches in flight for its weight
+
+        :raises wavelink.InvalidNodeException: No node is connected
+        """
+        nodes = self._connected("search")
+        if not nodes:
+            raise wavelink.InvalidNodeException("No search nodes are connected.")
+
+        def busy(node: wavelink.Node) -> typing.Tuple[float, float]:
+            stats = self.stats.get(node.identifier)
+            return (
+                (self._searching.get(node.identifier, 0) + 1)
+                / self._options(node).weight,
+                stats.cpu.system_load if stats else 0.0,
+            )
+
+        return min(nodes, key=busy)
+
+    async def search(
+        self,
+        query: str,
+        *,
+        source: typing.Union[
+            wavelink.TrackSource, str, None
+        ] = wavelink.TrackSource.YouTubeMusic,
+    ) -> wavelink.Search:
+        """Search for tracks on :meth:`search_node`, see :meth:`wavelink.Playable.search`"""
+        prefix = SOURCES.get(source, source)
+        if not yarl.URL(query).host and prefix:
+            query = f"{prefix.removesuffix(':')}:{query}"
+
+        node = self.search_node()
+        self._searching[node.identifier] = self._searching.get(node.identifier, 0) + 1
+        try:
+            response = await node.send(
+                "GET", path="v4/loadtracks", params={"identifier": query}
+            )
+        finally:
+            self._searching[node.identifier] -= 1
+
+        kind, data = response["loadType"], response.get("data")
+        if kind == "track":
+            return [wavelink.Playable(data)]
+        if kind == "search":
+            return [wavelink.Playable(track) for track in data]
+        if kind == "playlist":
+            return wavelink.Playlist(data)
+        if kind == "error":
+            raise wavelink.LavalinkLoadException(data=data)
+        return []
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def refresh(self) -> None:
+        """Fetch the stats of every connected node"""
+        nodes = [
+            node
+            for node in wavelink.Pool.nodes.values()
+            if node.status is wavelink.NodeStatus.CONNECTED
+        ]
+        results = await asyncio.gather(
+            *(node.fetch_stats() for node in nodes), return_exceptions=True
+        )
+
+        for node, result in zip(nodes, results):
+            if isinstance(result, Exception):
+                self.logger.warning(
+                    f"Couldn't fetch stats of node {node.identifier}: {result}"
+                )
+                self.stats.pop(node.identifier, None)
+            else:
+                self.stats[node.identifier] = result
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,160 @@
+import asyncio
+import contextlib
+import logging
+import typing
+
+import discord
+
+
+class NowPlaying:
+    """Keeps one now-playing message per player up to date
+
+    :meth:`update` only marks the message stale. A single task waits
+    ``delay`` seconds, so a burst of track changes collapses into one
+    request, and keeps ``interval`` seconds between requests. It then renders
+    the latest state and edits the existing message. A new message is sent
+    only if the old one is gone, older than ``max_age`` seconds, or has
+    ``max_behind`` or more messages below it. Only the message id is kept,
+    requests go through a partial message. After :meth:`move`, the message
+    in the old channel is deleted before one is posted in the new channel.
+
+    :param channel: Channel to send to
+    :type channel: discord.abc.Messageable
+    :param render: Returns the embed for the current state, or None to leave the message as is
+    :type render: typing.Callable[[], typing.Optional[discord.Embed]]
+    :param delay: Seconds to wait for more updates before sending, defaults to 1.0
+    :type delay: float, optional
+    :param interval: Minimum seconds between requests, defaults to 2.0
+    :type interval: float, optional
+    :param max_age: Seconds after which a message is replaced instead of edited, defaults to 600
+    :type max_age: float, optional
+    :param max_behind: Messages below it after which a message is replaced, defaults to 10
+    :type max_behind: int, optional
+    """
+
+    def __init__(
+        self,
+        channel: discord.abc.Messageable,
+        render: typing.Callable[[], typing.Optional[discord.Embed]],
+        *,
+        delay: float = 1.0,
+        interval: float = 2.0,
+        max_age: float = 600,
+        max_behind: int = 10,
+    ) -> None:
+        self.channel = channel
+        self._render = render
+
+        self.delay = delay
+        self.interval = interval
+        self.max_age = max_age
+        self.max_behind = max_behind
+
+        self.message_id: typing.Optional[int] = None
+        # Messages sent in the channel since the current message
+        self.behind = 0
+
+        self._dirty = False
+        # Messages left in channels the controller moved away from
+        self._leftover: typing.List[discord.PartialMessage] = []
+        self._last = 0.0
+        self._task: typing.Optional[asyncio.Task] = None
+
+        # Updates asked for, and requests actually made
+        self.updates = 0
+        self.requests = 0
+
+        self.logger = logging.getLogger("discord.bot.nowplaying")
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the current message is recent and visible enough to edit"""
+        if self.message_id is None or self.behind >= self.max_behind:
+            return False
+
+        age = discord.utils.utcnow() - discord.utils.snowflake_time(self.message_id)
+        return age.total_seconds() < self.max_age
+
+    def update(self) -> None:
+        """Show the latest state soon"""
+        self.updates += 1
+        self._dirty = True
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def move(self, channel: discord.abc.Messageable) -> None:
+        """Post in ``channel`` from now on, deleting the message in the old one"""
+        if channel.id == self.channel.id:
+            return
+
+        if self.message_id is not None:
+            self._leftover.append(self.channel.get_partial_message(self.message_id))
+            self._wake()
+
+        self.channel = channel
+        self.message_id = None
+        self.behind = 0
+
+    def adopt(self, message: discord.abc.Snowflake) -> None:
+        """Use a message sent elsewhere, e.g. a command response, from now on"""
+        self.message_id = message.id
+        self.behind = 0
+
+    def seen(self, message: discord.Message) -> None:
+        """Count a message sent in the channel"""
+        if self.message_id is not None and message.id != self.message_id:
+            self.behind += 1
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while self._dirty or self._leftover:
+            await asyncio.sleep(
+                max(self.delay, self._last + self.interval - loop.time())
+            )
+            dirty, self._dirty = self._dirty, False
+
+            try:
+                while self._leftover:
+                    self.requests += 1
+                    with contextlib.suppress(discord.HTTPException):
+                        await self._leftover.pop().delete()
+
+                if dirty:
+                    await self._flush()
+            except Exception as e:
+                self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+
+            self._last = loop.time()
+
+    async def _flush(self) -> None:
+        embed = self._render()
+        if embed is None:
+            return
+
+        if self.fresh:
+            self.requests += 1
+            try:
+                await self.channel.get_partial_message(self.message_id).edit(
+                    embed=embed
+                )
+                return
+            except discord.NotFound:
+                self.message_id = None
+
+        if self.message_id is not None:
+            old, self.message_id = self.message_id, None
+            self.requests += 1
+            with contextlib.suppress(discord.HTTPException):
+                await self.channel.get_partial_message(old).delete()
+
+        self.requests += 1
+        self.adopt(await self.channel.send(embed=embed))
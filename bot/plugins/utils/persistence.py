@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import json
+import logging
+import typing
+
+if typing.TYPE_CHECKING:
+    from subclasses.bot import Bot
+
+State = typing.Dict[str, typing.Any]
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS player_state (
+    guild BIGINT PRIMARY KEY,
+    state JSONB NOT NULL,
+    updated TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+UPSERT_STATE = """
+INSERT INTO player_state (guild, state, updated)
+VALUES ($1, $2::jsonb, now())
+ON CONFLICT (guild) DO UPDATE SET state = EXCLUDED.state, updated = EXCLUDED.updated
+"""
+
+DELETE_STALE = """
+DELETE FROM player_state WHERE updated < now() - make_interval(secs => $1)
+"""
+
+
+class PlayerStore:
+    """Snapshots of players kept in Postgres, written in batches
+
+    :meth:`mark` only notes that a guild's player changed. Every ``interval``
+    seconds the guilds marked since are snapshotted and written in one
+    transaction, so a player that changed many times costs one row write and
+    players that didn't change cost nothing. Guilds with no snapshot, e.g.
+    because the player left, have their row deleted.
+
+    :param bot: Bot whose database to write to, see :meth:`Bot.acquire`
+    :type bot: Bot
+    :param snapshot: Returns the state of a guild's player, or None if there is nothing to keep
+    :type snapshot: typing.Callable[[int], typing.Optional[State]]
+    :param interval: Seconds between writes, defaults to 5.0
+    :type interval: float, optional
+    """
+
+    def __init__(
+        self,
+        bot: "Bot",
+        snapshot: typing.Callable[[int], typing.Optional[State]],
+        *,
+        interval: float = 5.0,
+    ) -> None:
+        self.bot = bot
+        self._snapshot = snapshot
+        self.interval = interval
+
+        self._dirty: typing.Set[int] = set()
+        self._task: typing.Optional[asyncio.Task] = None
+
+        # Rows written and deleted
+        self.writes = 0
+        self.deletes = 0
+
+        self.logger = logging.getLogger("discord.bot.persistence")
+
+    async def start(self) -> None:
+        async with self.bot.acquire() as connection:
+            await connection.execute(CREATE_TABLE)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop writing on a timer and write whatever is still marked"""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        await self.flush()
+
+    def mark(self, guild_id: int) -> None:
+        """Note that a guild's player changed, it is written with the next batch"""
+        self._dirty.add(guild_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+
+    async def flush(self) -> None:
+        """Write the snapshots of every marked guild now"""
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+
+        rows = []
+        gone = []
+        for guild_id in dirty:
+            state = self._snapshot(guild_id)
+            if state is None:
+                gone.append(guild_id)
+            else:
+                rows.append((guild_id, json.dumps(state)))
+
+        try:
+            async with self.bot.transaction() as connection:
+                if rows:
+                    await connection.executemany(UPSERT_STATE, rows)
+                if gone:
+                    await connection.execute(
+                        "DELETE FROM player_state WHERE guild = ANY($1::bigint[])",
+                        gone,
+                    )
+        except BaseException:
+            # Snapshot them again with the next batch
+            self._dirty |= dirty
+            raise
+
+        self.writes += len(rows)
+        self.deletes += len(gone)
+
+    async def load(
+        self, guilds: typing.Sequence[int], *, max_age: float
+    ) -> typing.List[typing.Tuple[int, State]]:
+        """Saved states of ``guilds``, forgetting any older than ``max_age`` seconds
+
+        :param guilds: Guilds to load, others may belong to another shard
+        :type guilds: typing.Sequence[int]
+        :param max_age: Seconds after which a state is too old to restore
+        :type max_age: float
+        :return: ``(guild id, state)`` pairs
+        :rtype: typing.List[typing.Tuple[int, State]]
+        """
+        async with self.bot.acquire() as connection:
+            await connection.execute(DELETE_STALE, float(max_age))
+            rows = await connection.fetch(
+                "SELECT guild, state FROM player_state WHERE guild = ANY($1::bigint[])",
+                list(guilds),
+            )
+        return [(row["guild"], json.loads(row["state"])) for row in rows]
@@ -0,0 +1,538 @@
+import asyncio
+import contextlib
+import logging
+import time
+import typing
+
+import aiohttp
+import discord
+import wavelink
+
+from .index import TrigramIndex
+from .metrics import Summary
+
+
+class QueueEntry:
+    """A queued track, holding only what the queue views need
+
+    A :class:`wavelink.Playable` keeps every field Lavalink sent plus the raw
+    payload. An entry keeps the title, author, uri, length and encoded track,
+    and is decoded back into a :class:`wavelink.Playable` by :meth:`resolve`
+    when it is about to be played. Tracks near the front of a :class:`Queue`
+    are kept whole, so only tracks that waited deeper in it are decoded.
+    """
+
+    __slots__ = ("title", "author", "uri", "length", "encoded")
+
+    def __init__(
+        self,
+        title: str,
+        author: str,
+        uri: typing.Optional[str],
+        length: int,
+        encoded: str,
+    ) -> None:
+        self.title = title
+        self.author = author
+        self.uri = uri
+        self.length = length
+        self.encoded = encoded
+
+    def __repr__(self) -> str:
+        return f"<QueueEntry title={self.title!r} author={self.author!r}>"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (QueueEntry, wavelink.Playable)):
+            return self.encoded == other.encoded
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.encoded)
+
+    @classmethod
+    def from_playable(cls, playable: wavelink.Playable) -> "QueueEntry":
+        return cls(
+            playable.title,
+            playable.author,
+            playable.uri,
+            playable.length,
+            playable.encoded,
+        )
+
+    def dump(self) -> typing.List[typing.Any]:
+        """A JSON-serialisable form of the entry, see :meth:`load`"""
+        return [self.title, self.author, self.uri, self.length, self.encoded]
+
+    @classmethod
+    def load(cls, data: typing.Sequence[typing.Any]) -> "QueueEntry":
+        return cls(*data)
+
+    async def resolve(self, node: wavelink.Node) -> wavelink.Playable:
+        """Decode the full track through Lavalink"""
+        data = await node.send(
+            "GET", path="v4/decodetrack", params={"encodedTrack": self.encoded}
+        )
+        return wavelink.Playable(data)
+
+
+Item = typing.Union[QueueEntry, wavelink.Playable]
+
+# Errors reaching or asking a node, see unplayable for which of them are final
+NODE_ERRORS = (
+    wavelink.LavalinkException,
+    wavelink.LavalinkLoadException,
+    wavelink.NodeException,
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+)
+
+
+def unplayable(error: BaseException) -> bool:
+    """Whether Lavalink rejected the track itself, rather than failing to answer
+
+    A load error or a 4xx response won't change on retry. Anything else, e.g.
+    a 5xx or a node that can't be reached, may well work on another try.
+    """
+    if isinstance(error, wavelink.LavalinkLoadException):
+        return True
+    return isinstance(error, wavelink.LavalinkException) and 400 <= error.status < 500
+
+
+def _compact(item: Item) -> Item:
+    if isinstance(item, wavelink.Playable):
+        return QueueEntry.from_playable(item)
+    return item
+
+
+class _Items(list):
+    """The list behind a :class:`Queue`, telling it how it changed
+
+    Tracks put in are stored as :class:`QueueEntry`, unless they land within
+    the queue's first :attr:`Queue.live` positions. Appends need no report,
+    they are indexed on the next search. Pops at either end are reported
+    precisely, anything that moves items around only marks the queue's index
+    stale.
+    """
+
+    __slots__ = ("queue",)
+
+    def __init__(self, queue: "Queue") -> None:
+        super().__init__()
+        self.queue = queue
+
+    def append(self, item: Item) -> None:
+        super().append(item if len(self) < self.queue.live else _compact(item))
+
+    def extend(self, items: typing.Iterable[Item]) -> None:
+        live = self.queue.live - len(self)
+        super().extend(
+            item if i < live else _compact(item) for i, item in enumerate(items)
+        )
+
+    def __iadd__(self, items: typing.Iterable[Item]) -> "_Items":
+        self.extend(items)
+        return self
+
+    def pop(self, index: typing.SupportsIndex = -1) -> Item:
+        size = len(self)
+        position = index.__index__()
+        if position < 0:
+            position += size
+
+        item = super().pop(index)
+
+        if position == 0:
+            self.queue._popped_front()
+        elif position != size - 1:
+            self.queue._invalidate()
+        else:
+            self.queue._popped_back()
+
+        return item
+
+    def insert(self, index: typing.SupportsIndex, item: Item) -> None:
+        position = index.__index__()
+        if position < 0:
+            position += len(self)
+
+        super().insert(index, item if position < self.queue.live else _compact(item))
+        if position < len(self) - 1:
+            self.queue._invalidate()
+
+    def remove(self, item: Item) -> None:
+        super().remove(item)
+        self.queue._invalidate()
+
+    def clear(self) -> None:
+        super().clear()
+        self.queue._invalidate()
+
+    def sort(self, *args: typing.Any, **kwargs: typing.Any) -> None:
+        super().sort(*args, **kwargs)
+        self.queue._invalidate()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self.queue._invalidate()
+
+    def __setitem__(self, index: typing.Any, value: typing.Any) -> None:
+        if isinstance(index, slice):
+            value = map(_compact, value)
+        else:
+            value = _compact(value)
+
+        super().__setitem__(index, value)
+        self.queue._invalidate()
+
+    def __delitem__(self, index: typing.Any) -> None:
+        super().__delitem__(index)
+        self.queue._invalidate()
+
+    def __imul__(self, n: int) -> "_Items":
+        super().__imul__(n)
+        self.queue._invalidate()
+        return self
+
+
+class Queue(wavelink.Queue):
+    """A :class:`wavelink.Queue` of compact entries that can be searched by title
+
+    Tracks are stored as :class:`QueueEntry`, so :meth:`get` and friends may
+    return one, see :meth:`Player.resolve`. Tracks put within the first
+    ``live`` positions are kept whole instead, so the track :meth:`get`
+    returns next usually plays straight away, e.g. the one ``/play`` just
+    found, and the first of a playlist. The history is a :class:`Queue` too,
+    with no tracks kept whole.
+
+    Every item has a slot, the position it had when the index last caught
+    up plus how many items have been taken off the front since. New items
+    are indexed on the next search, taking items off either end updates the
+    index in place, and anything that reorders the queue rebuilds it on the
+    next search. A search indexes at most :attr:`index_batch` new items, so
+    a huge queue is indexed front first over a few keystrokes instead of
+    blocking on one.
+    """
+
+    index_batch = 5000
+
+    def __init__(self, *, history: bool = True, live: int = 2) -> None:
+        super().__init__(history=history)
+        if history:
+            self._history = Queue(history=False, live=0)
+
+        self.live = live
+        self._items = _Items(self)
+        self._index = TrigramIndex()
+        # Slot of the first item, and of the first item not yet indexed
+        self._head = 0
+        self._indexed = 0
+
+    @staticmethod
+    def _check_compatibility(item: object) -> bool:
+        if not isinstance(item, (QueueEntry, wavelink.Playable)):
+            raise TypeError(
+                "This queue is restricted to Playable and QueueEntry objects."
+            )
+        return True
+
+    def _popped_front(self) -> None:
+        self._index.discard(self._head)
+        self._head += 1
+        self._indexed = max(self._indexed, self._head)
+
+    def _popped_back(self) -> None:
+        tail = self._head + len(self._items)
+        self._index.discard(tail)
+        self._indexed = min(self._indexed, tail)
+
+    def _invalidate(self) -> None:
+        self._index.clear()
+        self._head = self._indexed = 0
+
+    def _catch_up(self) -> None:
+        tail = min(self._head + len(self._items), self._indexed + self.index_batch)
+        for slot in range(self._indexed, tail):
+            self._index.add(slot, self._items[slot - self._head].title)
+        self._indexed = tail
+
+    def search(
+        self, query: str, limit: int = 25
+    ) -> typing.List[typing.Tuple[int, Item]]:
+        """Queued tracks whose title best matches ``query``
+
+        :param query: Text being typed
+        :type query: str
+        :param limit: Maximum matches, defaults to 25
+        :type limit: int, optional
+        :return: ``(position, track)`` pairs, best match first
+        :rtype: typing.List[typing.Tuple[int, Item]]
+        """
+        self._catch_up()
+        return [
+            (slot - self._head, self._items[slot - self._head])
+            for _, slot in self._index.search(query, limit)
+        ]
+
+
+class Player(wavelink.Player):
+    """A :class:`wavelink.Player` whose queue is a compact, searchable :class:`Queue`
+
+    Once the current track is within ``music.prefetch_window`` seconds of its
+    end, the track that will play next is resolved in the background, so
+    decoding it doesn't add to the silence between tracks. Entries Lavalink
+    rejects are dropped from the queue there and then, entries that fail to
+    resolve because of the node are left where they are, see :func:`unplayable`.
+    """
+
+    def __init__(
+        self,
+        client: discord.Client = discord.utils.MISSING,
+        channel: discord.abc.Connectable = discord.utils.MISSING,
+        *,
+        nodes: typing.Optional[typing.List[wavelink.Node]] = None,
+    ) -> None:
+        # Let the bot's balancer pick the node, see NodeBalancer.best
+        if not nodes and (balancer := getattr(client, "nodes", None)):
+            nodes = [balancer.best(getattr(channel, "rtc_region", None))]
+
+        super().__init__(client, channel, nodes=nodes)
+        self.queue = Queue()
+
+        config = getattr(self.client, "config", {}).get("music", {})
+        self.prefetch_window: float = config.get("prefetch_window", 10)
+
+        self._prefetched: typing.Optional[typing.Tuple[Item, wavelink.Playable]] = None
+        self._prefetch_task: typing.Optional[asyncio.Task] = None
+        # The last track played, which loop mode plays again
+        self._last: typing.Optional[wavelink.Playable] = None
+        self._finished_at: typing.Optional[float] = None
+
+        # Seconds between a track finishing and the next one starting
+        self.gaps = Summary()
+        # Seconds from losing a node to playing again on another, see migrate
+        self.recoveries = Summary()
+        self.prefetch_hits = 0
+        self.skipped = 0
+
+        self.logger = logging.getLogger("discord.bot.player")
+
+    def _peek(self) -> typing.Optional[typing.Tuple[typing.Optional[Queue], Item]]:
+        """The queue item :meth:`Queue.get` returns next, and the queue holding it"""
+        queue = self.queue
+
+        if queue.mode is wavelink.QueueMode.loop and queue.loaded is not None:
+            return None, queue.loaded
+        if queue:
+            return queue, queue[0]
+        if queue.mode is wavelink.QueueMode.loop_all and queue.history:
+            return queue.history, queue.history[0]
+        return None
+
+    def _drop(self, container: typing.Optional[Queue], item: Item) -> None:
+        self.skipped += 1
+        self.logger.warning(
+            f"{self.guild.id} Skipping {item!r}, it couldn't be resolved"
+        )
+
+        if container is None:
+            if self.queue.loaded is item:
+                self.queue.loaded = None
+        elif container and container[0] is item:
+            container.delete(0)
+
+    async def resolve(self, item: Item) -> wavelink.Playable:
+        """The full track of a queue item, ready to play"""
+        if self._prefetched is not None and self._prefetched[0] is item:
+            playable = self._prefetched[1]
+            self._prefetched = None
+            self.prefetch_hits += 1
+            return playable
+
+        if isinstance(item, wavelink.Playable):
+            return item
+        if self._last is not None and item == self._last:
+            return self._last
+
+        return await item.resolve(self.node)
+
+    async def prefetch(self) -> None:
+        """Resolve the track that will play next, dropping any Lavalink rejects"""
+        for _ in range(5):
+            peeked = self._peek()
+            if peeked is None:
+                return
+
+            container, item = peeked
+            if self._prefetched is not None and self._prefetched[0] is item:
+                return
+
+            try:
+                playable = await self.resolve(item)
+            except NODE_ERRORS as e:
+                if not unplayable(e):
+                    # Leave it queued, play_next tries again when it is due
+                    self.logger.warning(
+                        f"{self.guild.id} Couldn't prefetch {item!r}: {e}"
+                    )
+                    return
+
+                self._drop(container, item)
+                continue
+
+            self._prefetched = item, playable
+            return
+
+    async def _prefetch_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        try:
+            await self.prefetch()
+        except Exception as e:
+            self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+
+    def track_started(self) -> None:
+        """Record the gap since the last track finished and schedule the prefetch"""
+        if self._finished_at is not None:
+            self.gaps.observe(time.monotonic() - self._finished_at)
+            self._finished_at = None
+
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+
+        current = self.current
+        if current is None:
+            return
+
+        delay = 0.0
+        if not current.is_stream:
+            delay = max(
+                0.0, (current.length - self.position) / 1000 - self.prefetch_window
+            )
+
+        self._prefetch_task = asyncio.create_task(self._prefetch_later(delay))
+
+    def track_finished(self) -> None:
+        self._finished_at = time.monotonic()
+
+    async def play_next(
+        self, item: typing.Optional[Item] = None, **kwargs: typing.Any
+    ) -> wavelink.Playable:
+        """Play ``item``, or the next queue item, skipping any Lavalink rejects
+
+        Keyword arguments are passed on to :meth:`play`, ``start`` only applies
+        to the first item tried.
+
+        :raises wavelink.QueueEmpty: Nothing left to play
+        :raises NODE_ERRORS: The node failed to resolve the item, a queue item is put back first
+        """
+        while True:
+            # Loop mode hands out the loaded track without taking it off the queue
+            taken = item is None and not (
+                self.queue.mode is wavelink.QueueMode.loop
+                and self.queue.loaded is not None
+            )
+            if item is None:
+                item = self.queue.get()
+
+            try:
+                playable = await self.resolve(item)
+            except NODE_ERRORS as e:
+                if not unplayable(e):
+                    if taken:
+                        self.queue.put_at(0, item)
+                    raise
+
+                self._drop(None, item)
+                item = None
+                kwargs.pop("start", None)
+                continue
+
+            self._last = playable
+            return await self.play(playable, **kwargs)
+
+    async def migrate(self, node: wavelink.Node, *, lost: bool = False) -> None:
+        """Move this player to ``node`` and carry on where it was
+
+        The queue is left as it is, and the current track is played on the new
+        node from its current position. If the old node was ``lost``, playback
+        resumes from the last position it reported instead, and it isn't asked
+        to destroy the player.
+        """
+        position = self._last_position if lost else self.position
+        old = self.node
+        guild_id = self.guild.id
+
+        old._players.pop(guild_id, None)
+        if not lost:
+            with contextlib.suppress(
+                wavelink.LavalinkException, wavelink.NodeException
+            ):
+                await old._destroy_player(guild_id)
+
+        self._node = node
+        node._players[guild_id] = self
+        # The voice session is still ours, hand it to the new node
+        await self._dispatch_voice_update()
+
+        if (current := self.current) is not None:
+            await self.play(
+                current,
+                start=position,
+                paused=self.paused,
+                volume=self.volume,
+                filters=self.filters,
+                add_history=False,
+            )
+
+    def snapshot(self) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """JSON-serialisable state to :meth:`restore` this player from
+
+        :return: The state, or None if nothing is playing or queued
+        :rtype: typing.Optional[typing.Dict[str, typing.Any]]
+        """
+        current = self.current
+        queue = self.queue
+        if current is None and not queue:
+            return None
+
+        return {
+            "channel": self.channel.id,
+            "current": _compact(current).dump() if current else None,
+            "position": self.position if current else 0,
+            "paused": self.paused,
+            "volume": self.volume,
+            "mode": queue.mode.name,
+            "queue": [_compact(item).dump() for item in queue],
+            "history": [_compact(item).dump() for item in queue.history],
+        }
+
+    async def restore(self, state: typing.Dict[str, typing.Any]) -> None:
+        """Pick up from a :meth:`snapshot`, resuming the current track where it was"""
+        queue = self.queue
+        queue.mode = wavelink.QueueMode[state["mode"]]
+
+        current = QueueEntry.load(state["current"]) if state["current"] else None
+        history = [QueueEntry.load(data) for data in state["history"]]
+        # Playing the current track adds it to the history again
+        if current is not None and history and history[-1] == current:
+            history.pop()
+
+        if history:
+            queue.history.put(history)
+        if state["queue"]:
+            queue.put([QueueEntry.load(data) for data in state["queue"]])
+
+        if current is not None:
+            # What loop mode plays again, as if it came from Queue.get()
+            queue.loaded = current
+
+        await self.play_next(
+            current,
+            start=state["position"],
+            paused=state["paused"],
+            volume=state["volume"],
+        )
+
+    async def disconnect(self, **kwargs: typing.Any) -> None:
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+        await super().disconnect(**kwargs)
@@ -5,6 +5,9 @@ from collections import deque
 from enum import Enum
 import contextlib
 
+# (insertion order, item)
+Entry = typing.Tuple[int, typing.Any]
+
 
 class Loop(Enum):
     OFF = 1
@@ -12,115 +15,205 @@ class Loop(Enum):
     ONE = 3
 
 
-class AsyncLoopShuffleQueue:
-    def __init__(self, items: typing.Optional[typing.List[typing.Any]] = []) -> None:
-        self._original = deque(items)
-        self._queue = deque(items)
-        self._up_next = asyncio.Queue()
+class _Slots:
+    """A deque with O(1) swaps anywhere, backed by a dict
+
+    ``unsorted`` is set once appended or swapped entries may no longer be in
+    insertion order.
+    """
+
+    __slots__ = ("_data", "_lo", "_hi", "unsorted")
+
+    def __init__(self) -> None:
+        self._data: typing.Dict[int, Entry] = {}
+        self._lo = 0
+        self._hi = 0
+        self.unsorted = False
+
+    def __len__(self) -> int:
+        return self._hi - self._lo
+
+    def append(self, entry: Entry) -> None:
+        if self._hi > self._lo and entry[0] < self._data[self._hi - 1][0]:
+            self.unsorted = True
+        self._data[self._hi] = entry
+        self._hi += 1
+
+    def appendleft(self, entry: Entry) -> None:
+        # Only used for entries played next in any case, not worth a sort
+        self._lo -= 1
+        self._data[self._lo] = entry
 
-        for i in items:
-            self._up_next.put_nowait(i)
+    def popleft(self) -> Entry:
+        entry = self._data.pop(self._lo)
+        self._lo += 1
+        return entry
 
-        self._current = None
+    def pop(self) -> Entry:
+        self._hi -= 1
+        return self._data.pop(self._hi)
 
-        self._history = deque()
+    def swap(self, first: int, second: int) -> None:
+        first += self._lo
+        second += self._lo
+        self._data[first], self._data[second] = self._data[second], self._data[first]
+        self.unsorted = True
+
+    def sort(self) -> None:
+        """Put the entries back in insertion order"""
+        entries = sorted(self._data[i] for i in range(self._lo, self._hi))
+        for i, entry in enumerate(entries, self._lo):
+            self._data[i] = entry
+        self.unsorted = False
+
+
+class AsyncLoopShuffleQueue:
+    """A queue of items to play, with history, looping and shuffling
+
+    Upcoming and played items are held in two :class:`_Slots`, so putting,
+    getting, going back and changing the loop mode are all O(1), and wrapping
+    round with :attr:`Loop.ALL` just swaps the two.
+
+    Shuffling is lazy: while shuffled, each :meth:`get` draws a random
+    upcoming item, one step of a Fisher–Yates shuffle, so nothing is copied
+    up front. Unshuffling puts the remaining items back in the order they
+    were added, by a sort on the next :meth:`get`. Items put at the front
+    with :meth:`putleft`, and items moved back by :meth:`previous`, are
+    always played next, shuffled or not. The history starts afresh each time
+    :attr:`Loop.ALL` wraps round, as it becomes the upcoming items.
+
+    :param items: Items to start with, defaults to None
+    :type items: typing.Optional[typing.Iterable[typing.Any]], optional
+    """
+
+    def __init__(
+        self, items: typing.Optional[typing.Iterable[typing.Any]] = None
+    ) -> None:
+        self._upcoming = _Slots()
+        self._history = _Slots()
+        self._current: typing.Optional[Entry] = None
+
+        # Upcoming items at the front that must be played in order
+        self._pinned = 0
+        # Insertion order of the next item put at either end
+        self._first = 0
+        self._last = 0
+
+        self._getters: typing.Deque[asyncio.Future] = deque()
 
         self._shuffled = False
         self._loop: Loop = Loop.OFF
 
-    def put(self, item: typing.Any) -> None:
-        self._original.append(item)
-        self._queue.append(item)
-        self._up_next.put_nowait(item)
+        for i in items or ():
+            self.put(i)
 
-    def putleft(self, item: typing.Any) -> None:
-        self._original.appendleft(item)
-        self._queue.appendleft(item)
-        self._up_next._queue.appendleft(item)
+    def __len__(self) -> int:
+        return len(self._upcoming)
 
-    async def get(self, *, force: bool = True) -> typing.Optional[typing.Any]:
-        ret = None
+    @property
+    def current(self) -> typing.Optional[typing.Any]:
+        return self._current[1] if self._current is not None else None
 
-        if self._loop is Loop.ONE and not force:
-            ret = self._current
-        else:
-            if self._up_next.empty():
-                if self._loop.ALL:
-                    self._up_next = asyncio.Queue()
-                    for i in list(self._queue):
-                        self._up_next.put_nowait(i)
+    def _wakeup_next(self) -> None:
+        while self._getters:
+            getter = self._getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                break
 
-            ret = await self._up_next.get()
+    def put(self, item: typing.Any) -> None:
+        self._upcoming.append((self._last, item))
+        self._last += 1
+        self._wakeup_next()
 
-        if self._current is not None and (self._loop is not Loop.ONE):
+    def putleft(self, item: typing.Any) -> None:
+        self._first -= 1
+        self._upcoming.appendleft((self._first, item))
+        self._pinned += 1
+        self._wakeup_next()
+
+    def _wrap(self) -> None:
+        # Everything has been played, play it all again. The history is in
+        # the order it was played, _take sorts it back into insertion order
+        if self._current is not None:
             self._history.append(self._current)
+            self._current = None
 
-        self._current = ret
+        self._upcoming, self._history = self._history, self._upcoming
+        self._pinned = 0
 
-        return ret
+    def _take(self) -> Entry:
+        upcoming = self._upcoming
 
-    def previous(self) -> typing.Optional[typing.Any]:
-        ret = None
+        if self._pinned:
+            self._pinned -= 1
+        elif self._shuffled:
+            upcoming.swap(0, random.randrange(len(upcoming)))
+        elif upcoming.unsorted:
+            upcoming.sort()
 
-        add_to_queue = False
+        return upcoming.popleft()
 
-        try:
-            ret = self._history.pop()
-            add_to_queue = True
-        except IndexError:
-            ret = None
+    async def get(self, *, force: bool = True) -> typing.Optional[typing.Any]:
+        """The next item, waiting for one to be put if there is none
+
+        :param force: Move on even when looping one item, defaults to True
+        :type force: bool, optional
+        """
+        if self._loop is Loop.ONE and not force and self._current is not None:
+            return self._current[1]
+
+        while not self._upcoming:
+            if self._loop is Loop.ALL and (self._history or self._current):
+                self._wrap()
+                break
+
+            getter = asyncio.get_running_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except asyncio.CancelledError:
+                getter.cancel()
+                with contextlib.suppress(ValueError):
+                    self._getters.remove(getter)
+                # Pass on a wakeup this getter already received
+                if self._upcoming and not getter.cancelled():
+                    self._wakeup_next()
+                raise
+
+        entry = self._take()
+
+        if self._current is not None:
+            self._history.append(self._current)
+        self._current = entry
 
-        if add_to_queue:
-            self._up_next._queue.appendleft(self._current)
+        return entry[1]
+
+    def previous(self) -> typing.Optional[typing.Any]:
+        """Go back to the last played item, the current one is played next"""
+        if not self._history:
+            return None
 
-        return ret
+        entry = self._history.pop()
+        if self._current is not None:
+            self._upcoming.appendleft(self._current)
+            self._pinned += 1
+        self._current = entry
+
+        return entry[1]
 
     def loop(self) -> Loop:
+        """Cycle the loop mode from off to all to one"""
         if self._loop is Loop.OFF:
             self._loop = Loop.ALL
+        elif self._loop is Loop.ALL:
+            self._loop = Loop.ONE
         else:
-            if self._loop is Loop.ALL:
-                self._loop = Loop.ONE
-                if self._current in self._original:
-                    index = self._queue.index(self._current)
-                else:
-                    index = 0
-
-                self._history = deque(list(self._queue)[:index])
-            else:
-                self._loop = Loop.OFF
+            self._loop = Loop.OFF
 
         return self._loop
 
     def shuffle(self) -> bool:
-        if self._shuffled:
-            # Find current song index in self._original
-            # Put all before current in history (reversed)
-            # Put all after current in queue (in order)
-            if self._current in self._original:
-                index = self._original.index(self._current) + 1
-            else:
-                index = 0
-
-            self._queue = self._original.copy()
-            self._up_next = asyncio.Queue()
-            for i in list(self._queue)[index:]:
-                self._up_next.put_nowait(i)
-
-            self._shuffled = False
-
-        else:
-            queue = list(self._queue)
-            with contextlib.suppress(ValueError):
-                current = queue.pop(queue.index(self._current))
-            random.shuffle(queue)
-            self._up_next = asyncio.Queue()
-            for i in queue:
-                self._up_next.put_nowait(i)
-
-            queue.insert(0, current)
-            self._queue = deque(queue)
-
-            self._shuffled = True
-
+        """Toggle shuffling of the upcoming items"""
+        self._shuffled = not self._shuffled
         return self._shuffled
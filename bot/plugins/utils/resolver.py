@@ -0,0 +1,113 @@
+import logging
+import typing
+
+import discord
+
+from .cache import TTLCache
+
+if typing.TYPE_CHECKING:
+    from discord.abc import GuildChannel
+
+
+class Resolver:
+    """Resolve channels and members from the gateway cache before asking the API
+
+    Objects that had to be fetched are kept for ``ttl`` seconds, and ids that
+    came back as 404/403 are remembered as missing for ``negative_ttl`` seconds
+    so deleted channels and departed members are not fetched over and over.
+
+    :param client: The client to resolve with
+    :type client: discord.Client
+    :param capacity: Maximum fetched and missing ids to remember, defaults to 10000
+    :type capacity: int, optional
+    :param ttl: Seconds to keep fetched objects, defaults to 300
+    :type ttl: float, optional
+    :param negative_ttl: Seconds to remember missing ids, defaults to 600
+    :type negative_ttl: float, optional
+    """
+
+    def __init__(
+        self,
+        client: discord.Client,
+        *,
+        capacity: int = 10000,
+        ttl: float = 300,
+        negative_ttl: float = 600,
+    ) -> None:
+        self.client = client
+
+        self._fetched: TTLCache[typing.Tuple[int, ...], typing.Any] = TTLCache(
+            capacity, ttl
+        )
+        self._missing: TTLCache[typing.Tuple[int, ...], bool] = TTLCache(
+            capacity, negative_ttl
+        )
+
+        # Lookups answered by the gateway cache, and those that needed the API
+        self.cached = 0
+        self.fetched = 0
+
+        self.logger = logging.getLogger("discord.bot.resolver")
+
+    def forget(self, *key: int) -> None:
+        """Drop anything remembered about a channel id or a (guild id, member id) pair"""
+        self._fetched.pop(key)
+        self._missing.pop(key)
+
+    async def _fetch(
+        self,
+        key: typing.Tuple[int, ...],
+        fetch: typing.Callable[[], typing.Awaitable[typing.Any]],
+    ) -> typing.Any:
+        if key in self._missing:
+            return None
+
+        if (obj := self._fetched.get(key)) is not None:
+            return obj
+
+        self.fetched += 1
+        try:
+            obj = await fetch()
+        except (discord.NotFound, discord.Forbidden) as e:
+            self.logger.debug(f"{key} is unavailable ({e.status}), remembering it")
+            self._missing.put(key, True)
+            return None
+
+        self._fetched.put(key, obj)
+        return obj
+
+    async def channel(self, channel_id: int) -> typing.Optional["GuildChannel"]:
+        """Resolve a channel
+
+        :param channel_id: Id of the channel
+        :type channel_id: int
+        :return: The channel, or None if it is gone or inaccessible
+        :rtype: typing.Optional[GuildChannel]
+        """
+        if (channel := self.client.get_channel(channel_id)) is not None:
+            self.cached += 1
+            return channel
+
+        return await self._fetch(
+            (channel_id,), lambda: self.client.fetch_channel(channel_id)
+        )
+
+    async def member(
+        self, guild: discord.Guild, member_id: int
+    ) -> typing.Optional[discord.Member]:
+        """Resolve a member of a guild
+
+        :param guild: Guild the member is in
+        :type guild: discord.Guild
+        :param member_id: Id of the member
+        :type member_id: int
+        :return: The member, or None if they left or are inaccessible
+        :rtype: typing.Optional[discord.Member]
+        """
+        if (member := guild.get_member(member_id)) is not None:
+            self.cached += 1
+            return member
+
+        return await self._fetch(
+            (guild.id, member_id), lambda: guild.fetch_member(member_id)
+        )
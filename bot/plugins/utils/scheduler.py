@@ -0,0 +1,228 @@
+import asyncio
+import contextlib
+import datetime
+import heapq
+import logging
+import typing
+
+Entry = typing.Mapping[str, typing.Any]
+Loader = typing.Callable[
+    [datetime.datetime, int], typing.Awaitable[typing.Sequence[Entry]]
+]
+Callback = typing.Callable[[Entry], None]
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class Scheduler:
+    """Fire entries at their ``due`` time from an in-memory heap
+
+    Entries are mappings with at least an ``id`` and a ``due`` key. Only entries
+    due before the loaded horizon are held in memory, everything later stays in
+    the durable store until the horizon moves past it. A single task sleeps
+    until the earliest deadline, so an idle scheduler costs one load per horizon.
+
+    Fired entries are remembered until :meth:`release` is called, which stops a
+    reload from firing them twice while their delivery is still in progress. A
+    fired entry removed before then is not fired again by :meth:`retry`.
+
+    :param loader: Coroutine returning up to ``limit`` entries due before ``until``, ordered by due
+    :type loader: Loader
+    :param callback: Called with every entry once it is due
+    :type callback: Callback
+    :param horizon: Seconds of upcoming entries to hold in memory, defaults to 600
+    :type horizon: float, optional
+    :param max_loaded: Maximum entries to load at once, defaults to 10000
+    :type max_loaded: int, optional
+    """
+
+    def __init__(
+        self,
+        loader: Loader,
+        callback: Callback,
+        *,
+        horizon: float = 600,
+        max_loaded: int = 10000,
+    ) -> None:
+        self._loader = loader
+        self._callback = callback
+
+        self.horizon = datetime.timedelta(seconds=horizon)
+        self.max_loaded = max_loaded
+
+        self._heap: typing.List[typing.Tuple[datetime.datetime, int]] = []
+        # Entry id -> (when it fires, entry)
+        self._entries: typing.Dict[int, typing.Tuple[datetime.datetime, Entry]] = {}
+        self._fired: typing.Set[int] = set()
+        # Fired entries removed while their delivery was in progress
+        self._removed: typing.Set[int] = set()
+        self._loaded_until: typing.Optional[datetime.datetime] = None
+        self._reload_at: typing.Optional[datetime.datetime] = None
+
+        self._wakeup = asyncio.Event()
+        self._task: typing.Optional[asyncio.Task] = None
+
+        self.logger = logging.getLogger("discord.bot.scheduler")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def loaded_until(self) -> typing.Optional[datetime.datetime]:
+        """Entries due before this are held in memory"""
+        return self._loaded_until
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def add(self, entry: Entry) -> bool:
+        """Schedule an entry that was just written to the store
+
+        :param entry: The entry to schedule
+        :type entry: Entry
+        :return: Whether the entry was added, it is otherwise picked up by a later load
+        :rtype: bool
+        """
+        if self._loaded_until is None or entry["due"] >= self._loaded_until:
+            return False
+
+        if entry["id"] in self._entries or entry["id"] in self._fired:
+            return False
+
+        self._push(entry)
+        return True
+
+    def remove(self, id: int) -> typing.Optional[Entry]:
+        """Unschedule an entry
+
+        The heap slot is dropped lazily once it reaches the top.
+
+        :param id: The id of the entry
+        :type id: int
+        :return: The removed entry, if it was loaded
+        :rtype: typing.Optional[Entry]
+        """
+        if id in self._fired:
+            self._removed.add(id)
+
+        scheduled = self._entries.pop(id, None)
+        return scheduled[1] if scheduled else None
+
+    def reload(self) -> None:
+        """Load from the store again straight away, e.g. after missing updates"""
+        self._reload_at = None
+        self._wakeup.set()
+
+    def release(self, *ids: int) -> None:
+        """Forget fired entries once they have been delivered or should be retried"""
+        self._fired.difference_update(ids)
+        self._removed.difference_update(ids)
+
+    def retry(self, entry: Entry, delay: float) -> None:
+        """Fire a fired entry again after ``delay`` seconds, e.g. when delivering it failed
+
+        Its ``due`` is left as is, so lateness is still measured from it.
+
+        :param entry: The entry to fire again
+        :type entry: Entry
+        :param delay: Seconds to wait
+        :type delay: float
+        """
+        self._fired.discard(entry["id"])
+        if entry["id"] in self._removed:
+            self._removed.discard(entry["id"])
+            return
+
+        self._push(entry, utcnow() + datetime.timedelta(seconds=delay))
+
+    def _push(
+        self, entry: Entry, at: typing.Optional[datetime.datetime] = None
+    ) -> None:
+        at = entry["due"] if at is None else at
+        self._entries[entry["id"]] = (at, entry)
+        heapq.heappush(self._heap, (at, entry["id"]))
+
+        if self._heap[0][1] == entry["id"]:
+            self._wakeup.set()
+
+    async def _load(self, now: datetime.datetime) -> None:
+        until = now + self.horizon
+        entries = await self._loader(until, self.max_loaded)
+        truncated = len(entries) >= self.max_loaded
+
+        if truncated:
+            # Only part of the horizon fit, stop where the load was cut off
+            until = entries[-1]["due"]
+
+        added = 0
+        for entry in entries:
+            if entry["id"] not in self._entries and entry["id"] not in self._fired:
+                self._push(entry)
+                added += 1
+
+        self._loaded_until = until
+
+        # Reload a little before the horizon runs out so nothing is late. A cut
+        # off load can't learn anything new until what it returned has fired,
+        # and backs off if it only returned a backlog still being delivered.
+        if truncated and added:
+            self._reload_at = until
+        elif truncated:
+            self._reload_at = now + datetime.timedelta(seconds=1)
+        else:
+            self._reload_at = until - self.horizon / 10
+
+        self.logger.debug(f"Loaded {added}/{len(entries)} entries due before {until}")
+
+    def _fire(self, now: datetime.datetime) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            at, id = heapq.heappop(self._heap)
+            scheduled = self._entries.get(id)
+
+            # Removed, or a stale slot left behind by a removal or retry
+            if scheduled is None or scheduled[0] != at:
+                continue
+
+            entry = scheduled[1]
+            del self._entries[id]
+            self._fired.add(id)
+
+            try:
+                self._callback(entry)
+            except Exception as e:
+                self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+
+    async def _run(self) -> None:
+        while True:
+            now = utcnow()
+
+            if self._reload_at is None or now >= self._reload_at:
+                try:
+                    await self._load(now)
+                except Exception as e:
+                    self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+                    await asyncio.sleep(5)
+                    continue
+
+                now = utcnow()
+
+            self._fire(now)
+
+            deadline = self._reload_at
+            if self._heap:
+                deadline = min(deadline, self._heap[0][0])
+
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    max((deadline - utcnow()).total_seconds(), 0),
+                )
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import typing
+
+import asyncpg
+import discord
+import wavelink
+import yarl
+
+from .cache import TTLCache
+from .trackstore import TrackStore
+
+Key = typing.Tuple[str, typing.Optional[str]]
+Source = typing.Union[wavelink.TrackSource, str, None]
+
+
+def weigh(result: wavelink.Search) -> int:
+    """Rough size of a search result in bytes"""
+    tracks = result.tracks if isinstance(result, wavelink.Playlist) else result
+    return 256 + sum(
+        512 + len(t.encoded) + len(t.title) + len(t.author) + len(t.uri or "")
+        for t in tracks
+    )
+
+
+class _Inflight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SearchCache:
+    """Shared cache of Lavalink search results
+
+    Results are keyed by normalised query and source, expire after ``ttl``
+    seconds and are evicted least recently used first once ``capacity``
+    results or roughly ``max_bytes`` are held. Concurrent identical searches
+    share one upstream request, which is cancelled if everyone waiting on it
+    gives up.
+
+    If :attr:`store` is set, results missing from memory are looked up there
+    before searching Lavalink, and results that were played are written to
+    it by :meth:`keep`, so they survive restarts.
+
+    :param capacity: Maximum results to keep, defaults to 2048
+    :type capacity: int, optional
+    :param ttl: Seconds to keep a result, defaults to 3600
+    :type ttl: float, optional
+    :param empty_ttl: Seconds to keep a search that found nothing, defaults to 300
+    :type empty_ttl: float, optional
+    :param max_bytes: Approximate memory budget, defaults to 64 MiB
+    :type max_bytes: int, optional
+    :param fetch: Makes the upstream search, defaults to :meth:`wavelink.Playable.search`
+    :type fetch: typing.Optional[typing.Callable[..., typing.Awaitable[wavelink.Search]]], optional
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int = 2048,
+        ttl: float = 3600,
+        empty_ttl: float = 300,
+        max_bytes: int = 64 * 1024 * 1024,
+        fetch: typing.Optional[
+            typing.Callable[..., typing.Awaitable[wavelink.Search]]
+        ] = None,
+    ) -> None:
+        self._results: TTLCache[Key, wavelink.Search] = TTLCache(
+            capacity, ttl, max_weight=max_bytes, weigh=weigh
+        )
+        self.empty_ttl = empty_ttl
+        self._search = fetch or wavelink.Playable.search
+        self._inflight: typing.Dict[Key, _Inflight] = {}
+        # Second tier, set once the database is connected
+        self.store: typing.Optional[TrackStore] = None
+
+        # Upstream searches made, searches that joined one already in flight,
+        # and results found in the store
+        self.upstream = 0
+        self.joined = 0
+        self.persisted = 0
+
+        self.logger = logging.getLogger("discord.bot.search")
+
+    def __str__(self) -> str:
+        return (
+            f"results={len(self._results)} bytes={self._results.weight} "
+            f"hit_ratio={self.hit_ratio:.2%} saved={self.saved} upstream={self.upstream} "
+            f"persisted={self.persisted}"
+        )
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.saved + self.upstream
+        return self.saved / total if total else 0.0
+
+    @property
+    def saved(self) -> int:
+        """Upstream searches avoided by the caches or by joining one in flight"""
+        return self._results.hits + self.joined + self.persisted
+
+    @staticmethod
+    def normalise(
+        query: str, source: typing.Union[wavelink.TrackSource, str, None]
+    ) -> Key:
+        query = query.strip()
+
+        # URLs are case sensitive and ignore the source
+        if yarl.URL(query).host:
+            return query, None
+
+        if isinstance(source, wavelink.TrackSource):
+            source = source.name
+
+        return " ".join(query.casefold().split()), source
+
+    async def _fetch(self, key: Key, query: str, source: Source) -> wavelink.Search:
+        store = self.store
+        if store is not None:
+            try:
+                result = await store.get(key)
+            except (asyncpg.PostgresError, OSError) as e:
+                self.logger.warning(f"Couldn't read the track store: {e}")
+                result = None
+
+            if result is not None:
+                self.persisted += 1
+                return result
+
+        self.upstream += 1
+        return await self._search(query, source=source)
+
+    def keep(
+        self,
+        query: str,
+        result: typing.Union[wavelink.Search, wavelink.Playable],
+        *,
+        source: Source = wavelink.TrackSource.YouTubeMusic,
+    ) -> None:
+        """Write ``result`` to the :attr:`store`, e.g. once it was chosen to play
+
+        Results of autocomplete are not kept, or every prefix typed would be.
+        """
+        if self.store is None or not result:
+            return
+
+        if isinstance(result, wavelink.Playable):
+            result = [result]
+        self.store.put(self.normalise(query, source), result)
+
+    def _store(self, key: Key, task: asyncio.Task) -> None:
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight.task is task:
+            del self._inflight[key]
+
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        result = task.result()
+        self._results.put(key, result, ttl=None if result else self.empty_ttl)
+
+    async def search(
+        self,
+        query: str,
+        *,
+        source: typing.Union[
+            wavelink.TrackSource, str, None
+        ] = wavelink.TrackSource.YouTubeMusic,
+    ) -> wavelink.Search:
+        """Search for tracks, see :meth:`wavelink.Playable.search`"""
+        key = self.normalise(query, source)
+
+        result = self._results.get(key, discord.utils.MISSING)
+        if result is not discord.utils.MISSING:
+            return result
+
+        inflight = self._inflight.get(key)
+        # A search that was given up on, or has finished but isn't stored yet,
+        # can't be joined, its result may be a cancellation
+        if inflight is None or inflight.task.done() or inflight.task.cancelling():
+            task = asyncio.create_task(self._fetch(key, query, source))
+            task.add_done_callback(lambda t: self._store(key, t))
+            inflight = self._inflight[key] = _Inflight(task)
+        else:
+            self.joined += 1
+
+        inflight.waiters += 1
+        try:
+            return await asyncio.shield(inflight.task)
+        finally:
+            inflight.waiters -= 1
+            if not inflight.waiters and not inflight.task.done():
+                inflight.task.cancel()
+                # Searches made from now on start afresh instead of joining it
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
@@ -0,0 +1,117 @@
+import asyncio
+import typing
+from collections import OrderedDict
+
+from .idle import IdleSweeper
+from .nowplaying import NowPlaying
+
+
+class GuildState:
+    """Runtime music state of one guild
+
+    Discord objects are referred to by id, so a record stays small however
+    long the bot runs.
+    """
+
+    __slots__ = ("guild_id", "now_playing", "enqueues")
+
+    def __init__(self, guild_id: int) -> None:
+        self.guild_id = guild_id
+        # Controller of the now playing message
+        self.now_playing: typing.Optional[NowPlaying] = None
+        # Tasks adding the rest of a playlist to the queue
+        self.enqueues: typing.Set[asyncio.Task] = set()
+
+    def __repr__(self) -> str:
+        return f"<GuildState guild_id={self.guild_id} enqueues={len(self.enqueues)}>"
+
+    def close(self) -> None:
+        """Stop everything running for the guild"""
+        for task in self.enqueues:
+            task.cancel()
+        self.enqueues.clear()
+
+        if self.now_playing is not None:
+            self.now_playing.close()
+
+
+class GuildStateStore:
+    """Bounded :class:`GuildState` records by guild id
+
+    Records are created by :meth:`state` and closed when they are evicted:
+    by :meth:`evict`, e.g. when the player disconnects or the guild is left,
+    once untouched for ``ttl`` seconds, or least recently used first once
+    there are ``capacity`` of them.
+
+    :param capacity: Maximum records, defaults to 10000
+    :type capacity: int, optional
+    :param ttl: Seconds a record is kept without being touched, defaults to 3600
+    :type ttl: float, optional
+    :param keep: Whether a guild's record is still in use when its ttl runs out, defaults to None
+    :type keep: typing.Optional[typing.Callable[[int], bool]], optional
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int = 10000,
+        ttl: float = 3600,
+        keep: typing.Optional[typing.Callable[[int], bool]] = None,
+    ) -> None:
+        self.capacity = capacity
+        self.keep = keep
+
+        self._records: OrderedDict[int, GuildState] = OrderedDict()
+        self._sweeper = IdleSweeper(self._expire, timeout=ttl)
+
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __str__(self) -> str:
+        return f"records={len(self)} capacity={self.capacity} evicted={self.evicted}"
+
+    def get(self, guild_id: int) -> typing.Optional[GuildState]:
+        """The guild's record if there is one, without touching it"""
+        return self._records.get(guild_id)
+
+    def state(self, guild_id: int) -> GuildState:
+        """The guild's record, created if needed, kept for another ``ttl`` seconds"""
+        record = self._records.get(guild_id)
+        if record is None:
+            record = self._records[guild_id] = GuildState(guild_id)
+            while len(self._records) > self.capacity:
+                self.evict(next(iter(self._records)))
+        else:
+            self._records.move_to_end(guild_id)
+
+        self._sweeper.arm(guild_id)
+        return record
+
+    def evict(self, guild_id: int) -> typing.Optional[GuildState]:
+        """Close and forget the guild's record
+
+        :return: The record, if there was one
+        :rtype: typing.Optional[GuildState]
+        """
+        self._sweeper.disarm(guild_id)
+        record = self._records.pop(guild_id, None)
+        if record is not None:
+            record.close()
+            self.evicted += 1
+        return record
+
+    def _expire(self, guild_id: int) -> None:
+        if self.keep is not None and self.keep(guild_id):
+            self._sweeper.arm(guild_id)
+        else:
+            self.evict(guild_id)
+
+    def start(self) -> None:
+        self._sweeper.start()
+
+    async def close(self) -> None:
+        await self._sweeper.close()
+        for guild_id in list(self._records):
+            self.evict(guild_id)
@@ -0,0 +1,311 @@
+import asyncio
+import contextlib
+import datetime
+import gzip
+import json
+import logging
+import typing
+
+import discord
+import wavelink
+
+if typing.TYPE_CHECKING:
+    from subclasses.bot import Bot
+
+# (normalised query or URL, source), see SearchCache.normalise
+Key = typing.Tuple[str, typing.Optional[str]]
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS track_cache (
+    query TEXT NOT NULL,
+    source TEXT NOT NULL,
+    result JSONB NOT NULL,
+    updated TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (query, source)
+)
+"""
+
+# Older rows never overwrite newer ones, so importing an old export is safe
+UPSERT_RESULT = """
+INSERT INTO track_cache (query, source, result, updated)
+VALUES ($1, $2, $3::jsonb, $4)
+ON CONFLICT (query, source) DO UPDATE
+SET result = EXCLUDED.result, updated = EXCLUDED.updated
+WHERE track_cache.updated < EXCLUDED.updated
+"""
+
+SELECT_RESULT = """
+SELECT result FROM track_cache
+WHERE query = $1 AND source = $2 AND updated > now() - make_interval(secs => $3)
+"""
+
+DELETE_STALE = """
+DELETE FROM track_cache WHERE updated < now() - make_interval(secs => $1)
+"""
+
+
+# Track info kept besides the encoded track, in order
+INFO = (
+    "identifier",
+    "isSeekable",
+    "author",
+    "length",
+    "isStream",
+    "title",
+    "uri",
+    "artworkUrl",
+    "isrc",
+    "sourceName",
+)
+
+
+def dump_track(track: wavelink.Playable) -> typing.List[typing.Any]:
+    """The encoded track and what is shown of it, without the raw payload"""
+    return [
+        track.encoded,
+        track.identifier,
+        track.is_seekable,
+        track.author,
+        track.length,
+        track.is_stream,
+        track.title,
+        track.uri,
+        track.artwork,
+        track.isrc,
+        track.source,
+    ]
+
+
+def load_track(data: typing.Sequence[typing.Any]) -> typing.Dict[str, typing.Any]:
+    encoded, *values = data
+    return {
+        "encoded": encoded,
+        "info": {**dict(zip(INFO, values)), "position": 0},
+        "pluginInfo": {},
+        "userData": {},
+    }
+
+
+def dump(result: wavelink.Search) -> typing.Dict[str, typing.Any]:
+    """A compact JSON-serialisable form of a search result, see :func:`load`"""
+    if isinstance(result, wavelink.Playlist):
+        return {
+            "playlist": {
+                "info": {"name": result.name, "selectedTrack": result.selected},
+                "pluginInfo": {
+                    "type": result.type,
+                    "url": result.url,
+                    "artworkUrl": result.artwork,
+                    "author": result.author,
+                },
+                "tracks": [dump_track(track) for track in result.tracks],
+            }
+        }
+    return {"tracks": [dump_track(track) for track in result]}
+
+
+def load(data: typing.Dict[str, typing.Any]) -> wavelink.Search:
+    if "playlist" in data:
+        playlist = data["playlist"]
+        return wavelink.Playlist(
+            {**playlist, "tracks": [load_track(track) for track in playlist["tracks"]]}
+        )
+    return [wavelink.Playable(load_track(track)) for track in data["tracks"]]
+
+
+class TrackStore:
+    """Search results kept in Postgres, the second tier of :class:`SearchCache`
+
+    Only results that were played are :meth:`put`, see :meth:`SearchCache.keep`,
+    so the table grows with what is listened to rather than with what is
+    typed. Tracks are kept as their encoded form and the fields shown of them,
+    see :func:`dump`. Results are looked up when they aren't in memory, and
+    are written behind in batches of up to ``batch_size``, at least every
+    ``interval`` seconds. Results older than ``max_age`` seconds are ignored
+    and removed on :meth:`start`. The whole store can be moved between
+    databases with :meth:`export` and :meth:`import_`.
+
+    :param bot: Bot whose database to read and write, see :meth:`Bot.acquire`
+    :type bot: Bot
+    :param max_age: Seconds a result is used for, defaults to 7 days
+    :type max_age: float, optional
+    :param batch_size: Pending results that trigger an early write, defaults to 500
+    :type batch_size: int, optional
+    :param interval: Seconds between writes, defaults to 10.0
+    :type interval: float, optional
+    """
+
+    def __init__(
+        self,
+        bot: "Bot",
+        *,
+        max_age: float = 7 * 24 * 60 * 60,
+        batch_size: int = 500,
+        interval: float = 10.0,
+    ) -> None:
+        self.bot = bot
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self._pending: typing.Dict[Key, typing.Tuple[str, datetime.datetime]] = {}
+        self._full = asyncio.Event()
+        self._task: typing.Optional[asyncio.Task] = None
+
+        # Lookups answered, lookups that found nothing, and results written
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        self.logger = logging.getLogger("discord.bot.trackstore")
+
+    def __str__(self) -> str:
+        return (
+            f"hits={self.hits} misses={self.misses} writes={self.writes} "
+            f"pending={len(self._pending)}"
+        )
+
+    async def start(self) -> None:
+        async with self.bot.acquire() as connection:
+            await connection.execute(CREATE_TABLE)
+            await connection.execute(DELETE_STALE, float(self.max_age))
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop writing on a timer and write whatever is pending"""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        await self.flush()
+
+    async def get(self, key: Key) -> typing.Optional[wavelink.Search]:
+        """The stored result for ``key``, or None"""
+        query, source = key
+        if pending := self._pending.get(key):
+            data = pending[0]
+        else:
+            async with self.bot.acquire() as connection:
+                data = await connection.fetchval(
+                    SELECT_RESULT, query, source or "", float(self.max_age)
+                )
+
+        if data is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return load(json.loads(data))
+
+    def put(self, key: Key, result: wavelink.Search) -> None:
+        """Store ``result`` with the next batch"""
+        self._pending[key] = json.dumps(dump(result)), discord.utils.utcnow()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    async def _run(self) -> None:
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._full.wait(), self.interval)
+
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error(str(e), exc_info=(type(e), e, e.__traceback__))
+
+    async def flush(self) -> None:
+        """Write every pending result now"""
+        self._full.clear()
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        rows = [
+            (query, source or "", data, updated)
+            for (query, source), (data, updated) in pending.items()
+        ]
+
+        try:
+            async with self.bot.acquire() as connection:
+                await connection.executemany(UPSERT_RESULT, rows)
+        except BaseException:
+            # Keep them for the next batch, unless they were put again since
+            for key, value in pending.items():
+                self._pending.setdefault(key, value)
+            raise
+
+        self.writes += len(rows)
+
+    async def export(self, path: str, *, chunk: int = 1000) -> int:
+        """Write every fresh result to a gzipped JSON lines file
+
+        :return: Results written
+        :rtype: int
+        """
+        await self.flush()
+
+        count = 0
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            async with self.bot.transaction() as connection:
+                cursor = await connection.cursor(
+                    "SELECT query, source, result, updated FROM track_cache "
+                    "WHERE updated > now() - make_interval(secs => $1)",
+                    float(self.max_age),
+                )
+                while rows := await cursor.fetch(chunk):
+                    lines = [
+                        json.dumps(
+                            {
+                                "query": row["query"],
+                                "source": row["source"],
+                                "result": json.loads(row["result"]),
+                                "updated": row["updated"].isoformat(),
+                            }
+                        )
+                        + "\n"
+                        for row in rows
+                    ]
+                    await asyncio.to_thread(f.writelines, lines)
+                    count += len(rows)
+
+        return count
+
+    async def import_(self, path: str, *, chunk: int = 1000) -> int:
+        """Load results from a file written by :meth:`export`
+
+        Results already stored are only replaced by newer ones.
+
+        :return: Results read
+        :rtype: int
+        """
+
+        def read(f: typing.IO[str]) -> typing.List[str]:
+            lines = []
+            for line in f:
+                lines.append(line)
+                if len(lines) >= chunk:
+                    break
+            return lines
+
+        count = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            while lines := await asyncio.to_thread(read, f):
+                rows = []
+                for line in lines:
+                    entry = json.loads(line)
+                    rows.append(
+                        (
+                            entry["query"],
+                            entry["source"],
+                            json.dumps(entry["result"]),
+                            datetime.datetime.fromisoformat(entry["updated"]),
+                        )
+                    )
+
+                async with self.bot.acquire() as connection:
+                    await connection.executemany(UPSERT_RESULT, rows)
+                count += len(rows)
+
+        return count
@@ -6,12 +6,14 @@ from discord import app_commands
 import discord
 import logging
 import typing
-import difflib
 import re
 from dateutil.relativedelta import relativedelta
 import parsedatetime
 import datetime
 
+from .cache import LRUCache
+from .player import Player
+
 
 SIMPLETIME = re.compile(
     """(?:(?P<years>[0-9])(?:years?|y))?
@@ -25,6 +27,25 @@ SIMPLETIME = re.compile(
     re.VERBOSE,
 )
 
+# Filler around the time part, e.g. "me in 10 minutes from now"
+FILLER_PREFIX = re.compile(
+    r"(?:me (?:to|in|at) )?(?:me after )?(?:me )?(?:me)?(?:after )?(?:after)?"
+)
+FILLER_SUFFIX = "from now"
+
+# Building a Calendar loads all of its locale constants, so share one
+CALENDAR = parsedatetime.Calendar(version=parsedatetime.VERSION_CONTEXT_STYLE)
+
+# Phrases whose result doesn't move by a fixed offset with the anchor, e.g. "in 2 months"
+UNANCHORED_ACCURACY = (
+    parsedatetime.pdtContext.ACU_YEAR
+    | parsedatetime.pdtContext.ACU_MONTH
+    | parsedatetime.pdtContext.ACU_HALFDAY
+)
+
+# Parsing a phrase again at this offset tells relative phrases from absolute ones
+PROBE = datetime.timedelta(days=1, hours=1, minutes=7, seconds=3)
+
 
 class PlayableTransformer(app_commands.Transformer):
     async def transform(
@@ -40,11 +61,18 @@ class PlayableTransformer(app_commands.Transformer):
         :rtype: wavelink.Playable
         """
         await interaction.response.defer(thinking=True, ephemeral=True)
-        ret = await wavelink.Playable.search(value)
+
+        cache = interaction.client.search_cache
+
+        # Picked from autocomplete, already resolved
+        ret = interaction.client.selections.get((interaction.user.id, value))
+        if ret is None:
+            ret = await cache.search(value)
 
         if not ret:
             raise app_commands.TransformerError
 
+        cache.keep(value, ret)
         return ret
 
     async def autocomplete(
@@ -52,15 +80,26 @@ class PlayableTransformer(app_commands.Transformer):
     ) -> List[app_commands.Choice[str]]:
         playables = []
         if value:
-            playables = await wavelink.Playable.search(value)
+            playables = await interaction.client.autocomplete.run(
+                interaction, lambda: interaction.client.search_cache.search(value), []
+            )
 
         if isinstance(playables, list):
+            offered = [p for p in playables if p.uri][:4]
             choices = [
                 app_commands.Choice(name=f"{p.title} - {p.author}", value=p.uri)
-                for p in playables
-            ][:4]
+                for p in offered
+            ]
+            for playable in offered:
+                interaction.client.selections.put(
+                    (interaction.user.id, playable.uri), playable
+                )
         else:
             choices = [app_commands.Choice(name=playables.name, value=playables.url)]
+            if playables.url:
+                interaction.client.selections.put(
+                    (interaction.user.id, playables.url), playables
+                )
 
         if value:
             choices.append(app_commands.Choice(name=value, value=value))
@@ -75,107 +114,180 @@ class QueueItemTransformer(app_commands.Transformer):
     async def autocomplete(
         self, interaction: discord.Interaction, value: str
     ) -> List[app_commands.Choice[str]]:
-        player: wavelink.Player = interaction.guild.voice_client
+        player: Player = interaction.guild.voice_client
         if not player:
             return []
         if not len(player.queue):
             return []
 
+        value = value.strip()
+        if value.isdigit():
+            # Jump to a position, e.g. "12" lists 12) onwards, "0" lists from 1)
+            start = max(int(value) - 1, 0)
+            matches = list(enumerate(player.queue[start : start + 25], start))
+        elif value:
+            matches = player.queue.search(value, 25)
+        else:
+            matches = []
+
         options = [
-            f"{index + 1}) {item.title}" for index, item in enumerate(player.queue)
+            f"{index + 1}) {item.title}"[:100]
+            for index, item in (matches or enumerate(player.queue[:25]))
         ]
 
-        similar = difflib.get_close_matches(
-            value,
-            options,
-        )
-
-        choices = [app_commands.Choice(name=i, value=i) for i in (similar or options)]
-        return choices[:25]
+        return [app_commands.Choice(name=i, value=i) for i in options]
 
 
 class DatetimeTransformer(app_commands.Transformer):
+    # value -> relativedeltas of the leading SIMPLETIME part and what is left
+    _simpletime: LRUCache[
+        str, typing.Optional[typing.Tuple[typing.Tuple[relativedelta, ...], str]]
+    ] = LRUCache(4096)
+    # value -> offset from the anchor, or None if it doesn't parse. Keyed by the
+    # whole value, since where the phrase may end is checked against its length
+    _phrases: LRUCache[str, typing.Optional[datetime.timedelta]] = LRUCache(4096)
+
     async def transform(self, interaction: discord.Interaction, value: Any) -> Any:
-        date_obj = interaction.created_at
+        return self.parse(value, interaction.created_at)
+
+    async def autocomplete(
+        self, interaction: discord.Interaction, value: str
+    ) -> List[app_commands.Choice[str]]:
+        if not value:
+            return []
 
-        retime = self._check_regex(date_obj, value)
+        try:
+            dt = self.parse(value, interaction.created_at)
+        except app_commands.TransformerError:
+            return []
+
+        preview = f" → {dt:%a %d %b %Y %H:%M} UTC"
+        return [
+            app_commands.Choice(
+                name=value[: 100 - len(preview)] + preview, value=value[:100]
+            )
+        ]
+
+    def parse(self, value: str, anchor: datetime.datetime) -> datetime.datetime:
+        """Parse a time relative to an anchor
+
+        Relative phrases are parsed once and then re-anchored, so "in 10 minutes"
+        only goes through parsedatetime the first time it is seen.
+
+        :param value: Value provided by the user
+        :type value: str
+        :param anchor: The time to parse relative to
+        :type anchor: datetime.datetime
+        :raises app_commands.TransformerError: The value could not be parsed
+        :return: The parsed time
+        :rtype: datetime.datetime
+        """
+        retime = self._check_regex(anchor, value)
 
         if retime is not None:
             ret, remaining = retime
+            return ret
 
-        else:
-            remaining = self._check_startswith(value)
+        remaining = self._check_startswith(value)
 
-            times: typing.Tuple[typing.Tuple[datetime.datetime, int, int, int, str]] = (
-                parsedatetime.Calendar(version=parsedatetime.VERSION_CONTEXT_STYLE).nlp(
-                    remaining, sourceTime=date_obj
-                )
+        offset = self._phrases.get(value, discord.utils.MISSING)
+        if offset is None:
+            raise app_commands.TransformerError(
+                value, discord.AppCommandOptionType.string, self
             )
-            if times is None or len(times) == 0:
-                raise app_commands.TransformerError
+        elif offset is not discord.utils.MISSING:
+            return anchor + offset
 
-            dt, timestatus, beginning, end, _ = times[0]
+        try:
+            ret, accuracy = self._parse_phrase(value, remaining, anchor)
+        except app_commands.TransformerError:
+            self._phrases.put(value, None)
+            raise
 
-            if not timestatus.hasDateOrTime:
-                raise app_commands.TransformerError
+        if not accuracy & UNANCHORED_ACCURACY:
+            try:
+                probe, _ = self._parse_phrase(value, remaining, anchor + PROBE)
+            except app_commands.TransformerError:
+                probe = None
 
-            if beginning not in (0, 1) and end != len(value):
-                raise app_commands.TransformerError
+            if probe is not None and probe - ret == PROBE:
+                self._phrases.put(value, ret - anchor)
 
-            if not timestatus.hasTime:
-                dt = dt.replace(
-                    hour=date_obj.hour,
-                    minute=date_obj.minute,
-                    second=date_obj.second,
-                    microsecond=date_obj.microsecond,
-                )
+        return ret
 
-            if timestatus.accuracy == parsedatetime.pdtContext.ACU_HALFDAY:
-                dt = dt.replace(day=date_obj.day + 1)
+    def _parse_phrase(
+        self, value: str, remaining: str, date_obj: datetime.datetime
+    ) -> typing.Tuple[datetime.datetime, int]:
+        times: typing.Tuple[typing.Tuple[datetime.datetime, int, int, int, str]] = (
+            CALENDAR.nlp(remaining, sourceTime=date_obj)
+        )
+        if times is None or len(times) == 0:
+            raise app_commands.TransformerError(
+                remaining, discord.AppCommandOptionType.string, self
+            )
 
-            ret = dt.replace(tzinfo=datetime.timezone.utc)
+        dt, timestatus, beginning, end, _ = times[0]
 
-        return ret
+        if not timestatus.hasDateOrTime:
+            raise app_commands.TransformerError(
+                remaining, discord.AppCommandOptionType.string, self
+            )
+
+        if beginning not in (0, 1) and end != len(value):
+            raise app_commands.TransformerError(
+                remaining, discord.AppCommandOptionType.string, self
+            )
+
+        if not timestatus.hasTime:
+            dt = dt.replace(
+                hour=date_obj.hour,
+                minute=date_obj.minute,
+                second=date_obj.second,
+                microsecond=date_obj.microsecond,
+            )
+
+        if timestatus.accuracy == parsedatetime.pdtContext.ACU_HALFDAY:
+            dt = dt.replace(day=date_obj.day + 1)
+
+        return dt.replace(tzinfo=datetime.timezone.utc), timestatus.accuracy
 
     def _check_regex(self, dt, argument):
+        cached = self._simpletime.get(argument, discord.utils.MISSING)
+        if cached is discord.utils.MISSING:
+            cached = self._match_simpletime(argument)
+            self._simpletime.put(argument, cached)
+
+        if cached is None:
+            return None
+
+        deltas, remaining = cached
+        for delta in deltas:
+            dt += delta
+
+        return dt, remaining
+
+    def _match_simpletime(
+        self, argument: str
+    ) -> typing.Optional[typing.Tuple[typing.Tuple[relativedelta, ...], str]]:
         remaining = argument
         match = SIMPLETIME.match(remaining)
         if match is None or not match.group(0):
             return None
+
+        deltas = []
         while match is not None and match.group(0):
             data = {k: int(v) for k, v in match.groupdict(default=0).items()}
             remaining = str(remaining[match.end() :]).strip()
-            dt += relativedelta(**data)
+            deltas.append(relativedelta(**data))
 
             match = SIMPLETIME.match(remaining)
 
-        ret = dt
-        return ret, remaining
+        return tuple(deltas), remaining
 
     def _check_startswith(self, reason: str):
-        if reason.startswith("me") and reason[:6] in (
-            "me to ",
-            "me in ",
-            "me at ",
-        ):
-            reason = reason[6:]
-
-        if reason[:2] == "me" and reason[:9] == "me after ":
-            reason = reason[9:]
-
-        if reason[:3] == "me ":
-            reason = reason[3:]
-
-        if reason[:2] == "me":
-            reason = reason[2:]
-
-        if reason[:6] == "after ":
-            reason = reason[6:]
-
-        if reason[:5] == "after":
-            reason = reason[5:]
+        reason = reason[FILLER_PREFIX.match(reason).end() :]
 
-        if reason.endswith("from now"):
-            reason = reason[:-8]
+        if reason.endswith(FILLER_SUFFIX):
+            reason = reason[: -len(FILLER_SUFFIX)]
 
         return reason.strip()
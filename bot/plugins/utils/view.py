@@ -1,6 +1,6 @@
 import discord
 import typing
-from .embed import NeutralEmbed, SuccessEmbed
+from .embed import ErrorEmbed, NeutralEmbed, SuccessEmbed
 
 
 class Confirm(discord.ui.View):
@@ -38,3 +38,119 @@ class Confirm(discord.ui.View):
     async def on_timeout(self) -> None:
         self.disable_children()
         await self.message.edit(view=self)
+
+
+class PageSource:
+    """Source of pages for a :class:`Paginator`
+
+    Pages are only rendered when the paginator navigates to them.
+    """
+
+    async def get_page(self, index: int) -> discord.Embed:
+        raise NotImplementedError
+
+    def has_page(self, index: int) -> bool:
+        """Whether the page at ``index`` exists, as far as the source knows yet"""
+        return index >= 0
+
+    @property
+    def page_count(self) -> typing.Optional[int]:
+        """Number of pages, if any page can be jumped to directly"""
+        return None
+
+
+class JumpToPage(discord.ui.Modal, title="Go to page"):
+    page = discord.ui.TextInput(label="Page", min_length=1, max_length=6)
+
+    def __init__(self, paginator: "Paginator") -> None:
+        super().__init__()
+        self.paginator = paginator
+        self.page.placeholder = f"1-{paginator.source.page_count}"
+
+    async def on_submit(self, interaction: discord.Interaction) -> None:
+        try:
+            index = int(self.page.value) - 1
+        except ValueError:
+            index = -1
+
+        if not self.paginator.source.has_page(index):
+            await interaction.response.send_message(
+                embed=ErrorEmbed(f"There is no page {self.page.value}"),
+                ephemeral=True,
+            )
+            return
+
+        await self.paginator.show_page(interaction, index)
+
+
+class Paginator(discord.ui.View):
+    def __init__(self, source: PageSource, *, timeout: typing.Optional[float] = 180):
+        super().__init__(timeout=timeout)
+        self.source = source
+        self.index = 0
+
+        if source.page_count is None:
+            self.remove_item(self.jump)
+        self.message: typing.Optional[
+            typing.Union[discord.InteractionMessage, discord.WebhookMessage]
+        ] = None
+
+    def disable_children(self):
+        for c in self.children:
+            c.disabled = True
+
+    def update_children(self):
+        self.previous.disabled = not self.source.has_page(self.index - 1)
+        self.next.disabled = not self.source.has_page(self.index + 1)
+        self.jump.disabled = (self.source.page_count or 0) < 2
+
+    async def start(
+        self,
+        interaction: discord.Interaction,
+        *,
+        ephemeral: bool = False,
+        index: int = 0,
+    ) -> None:
+        self.index = index
+        embed = await self.source.get_page(self.index)
+        self.update_children()
+
+        if interaction.response.is_done():
+            self.message = await interaction.followup.send(
+                embed=embed, view=self, ephemeral=ephemeral, wait=True
+            )
+        else:
+            await interaction.response.send_message(
+                embed=embed, view=self, ephemeral=ephemeral
+            )
+            self.message = await interaction.original_response()
+
+    async def show_page(self, interaction: discord.Interaction, index: int) -> None:
+        embed = await self.source.get_page(index)
+        self.index = index
+        self.update_children()
+
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.grey)
+    async def previous(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ) -> None:
+        await self.show_page(interaction, self.index - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.grey)
+    async def next(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ) -> None:
+        await self.show_page(interaction, self.index + 1)
+
+    @discord.ui.button(label="Go to page", style=discord.ButtonStyle.grey)
+    async def jump(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ) -> None:
+        await interaction.response.send_modal(JumpToPage(self))
+
+    async def on_timeout(self) -> None:
+        self.disable_children()
+        if self.message:
+            await self.message.edit(view=self)
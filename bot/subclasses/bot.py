@@ -1,3 +1,4 @@
+import contextlib
 import logging
 import os
 import typing
@@ -11,6 +12,13 @@ from discord.app_commands import CommandTree
 from discord.ext import commands
 from discord.ext.commands import Bot
 from dotenv import load_dotenv
+from plugins.utils.autocomplete import AutocompleteCoordinator
+from plugins.utils.cache import LRUCache, TTLCache
+from plugins.utils.nodes import NodeBalancer, NodeOptions
+from plugins.utils.resolver import Resolver
+from plugins.utils.search import SearchCache
+from plugins.utils.state import GuildStateStore
+from plugins.utils.trackstore import TrackStore
 
 load_dotenv()
 
@@ -40,25 +48,99 @@ class Bot(Bot):
             "session", None
         )
 
-        self.voice_extras: typing.Dict[int, typing.Dict[str, discord.Message]] = {}
+        # Runtime music state of each guild, kept while it has a voice client
+        guild_state = self.config.get("cache", {}).get("guild_state", {})
+        self.guild_states = GuildStateStore(
+            capacity=guild_state.get("capacity", 10000),
+            ttl=guild_state.get("ttl", 3600),
+            keep=lambda guild_id: (guild := self.get_guild(guild_id)) is not None
+            and guild.voice_client is not None,
+        )
+
+        # Users known to exist in public.user, so a reminder can skip creating them
+        self.known_users: LRUCache[int, bool] = LRUCache(
+            self.config.get("cache", {}).get("known_users", 10000)
+        )
+
+        # Cache-first channel/member lookups shared by every plugin
+        resolver = self.config.get("cache", {}).get("resolver", {})
+        self.resolver = Resolver(
+            self,
+            capacity=resolver.get("capacity", 10000),
+            ttl=resolver.get("ttl", 300),
+            negative_ttl=resolver.get("negative_ttl", 600),
+        )
+
+        # Which Lavalink node new players and searches go to
+        self.nodes = NodeBalancer(
+            interval=self.config.get("wavelink", {}).get("stats_interval", 30.0)
+        )
+
+        # Lavalink search results shared by every guild
+        search = self.config.get("cache", {}).get("search", {})
+        self.search_cache = SearchCache(
+            capacity=search.get("capacity", 2048),
+            ttl=search.get("ttl", 3600),
+            empty_ttl=search.get("empty_ttl", 300),
+            max_bytes=search.get("max_bytes", 64 * 1024 * 1024),
+            fetch=self.nodes.search,
+        )
+
+        # (user id, choice value) -> track or playlist offered to that user by
+        # autocomplete, so picking a choice doesn't search again
+        selection = self.config.get("cache", {}).get("selection", {})
+        self.selections: TTLCache[
+            typing.Tuple[int, str], typing.Union[wavelink.Playable, wavelink.Playlist]
+        ] = TTLCache(selection.get("capacity", 20000), selection.get("ttl", 300))
+
+        # At most one autocomplete search in flight per user and command
+        autocomplete = self.config.get("autocomplete", {})
+        self.autocomplete = AutocompleteCoordinator(
+            quiet=autocomplete.get("quiet", 0.3),
+            capacity=autocomplete.get("capacity", 10000),
+            ttl=autocomplete.get("ttl", 120),
+        )
 
         self.logger = logging.getLogger("discord.bot")
         self.logger.info("#############################")
         self.logger.info(f"Running on discord.py {discord.__version__}")
         self.logger.info("#############################")
 
-        self.database: asyncpg.Connection
+        self.database: asyncpg.Pool
 
     async def setup_hook(self):
+        self.guild_states.start()
+
         if database := self.config.get("database", None):
-            self.database = await asyncpg.connect(
+            self.database = await asyncpg.create_pool(
                 host=database.get("host", None),
                 port=database.get("port", 5432),
                 user=database.get("user", None),
                 database=database.get("database", None),
                 password=os.getenv("DATABASE"),
+                min_size=database.get("min_size", 2),
+                max_size=database.get("max_size", 10),
+                statement_cache_size=database.get("statement_cache_size", 100),
+                max_inactive_connection_lifetime=database.get(
+                    "max_inactive_connection_lifetime", 300.0
+                ),
+                init=self._database_init if database.get("init") else None,
+                setup=self._database_setup if database.get("setup") else None,
             )
-            self.logger.getChild("database").info("Database connected")
+            self.logger.getChild("database").info(
+                f"Database pool connected ({self.database.get_min_size()}-{self.database.get_max_size()} connections)"
+            )
+
+            # Search results kept across restarts, behind the in-memory cache
+            tracks = self.config.get("cache", {}).get("tracks", {})
+            if tracks.get("enabled", True):
+                self.search_cache.store = TrackStore(
+                    self,
+                    max_age=tracks.get("max_age", 7 * 24 * 60 * 60),
+                    batch_size=tracks.get("batch_size", 500),
+                    interval=tracks.get("interval", 10.0),
+                )
+                await self.search_cache.store.start()
 
         for plugin in self.config.get("plugins", []):
             logger = self.logger.getChild("plugins")
@@ -68,29 +150,44 @@ class Bot(Bot):
         if WL_CONF := self.config.get("wavelink", None):
             wl_logger = logging.getLogger("discord.wavelink")
 
-            host: str = WL_CONF.get("host", None)
-            port = WL_CONF.get("port", 2333)
-            secure = WL_CONF.get("secure", True)
-            password = WL_CONF.get("password", os.getenv("WAVELINK"))
+            # Either a list of nodes, or a single node configured in the block itself
+            nodes = []
+            for conf in WL_CONF.get("nodes", [WL_CONF]):
+                host: str = conf.get("host", None)
+                if host is None:
+                    wl_logger.critical(
+                        "URL not provided, cannot initialise wavelink node!"
+                    )
+                    continue
 
-            if host is None:
-                wl_logger.critical(
-                    "URL not provided, cannot initialise wavelink nodes!"
+                port = conf.get("port", 2333)
+                secure = conf.get("secure", True)
+                node = wavelink.Node(
+                    identifier=conf.get("identifier", f"{host}:{port}"),
+                    uri=f"http{'s' if secure else ''}://{host}:{port}",
+                    password=conf.get("password", os.getenv("WAVELINK")),
+                    session=self.session,
+                    # Idle players are timed out by the Music plugin's sweeper
+                    inactive_player_timeout=None,
                 )
-            else:
-                nodes = [
-                    wavelink.Node(
-                        uri=f"http{'s' if secure else ''}://{host}:{port}",
-                        password=password,
-                        session=self.session,
-                    )
-                ]
+                self.nodes.add(
+                    node,
+                    NodeOptions(
+                        weight=conf.get("weight", 1.0),
+                        regions=conf.get("regions", ()),
+                        playback=conf.get("playback", True),
+                        search=conf.get("search", True),
+                    ),
+                )
+                nodes.append(node)
 
+            if nodes:
                 try:
                     n = await wavelink.Pool.connect(nodes=nodes, client=self)
                     wl_logger.info(
-                        f"Connected {len(n)}/{len(nodes)} wavelink node{'s' if len(n) > 1 else ''}"
+                        f"Connected {len(n)}/{len(nodes)} wavelink node{'s' if len(nodes) > 1 else ''}"
                     )
+                    self.nodes.start()
                 except wavelink.AuthorizationFailedException:
                     wl_logger.critical(
                         "Wavelink password incorrect. Cannot connect nodes!"
@@ -116,18 +213,51 @@ class Bot(Bot):
                         "'guild' is not specified in config.yaml, could not sync to development server!"
                     )
 
-    async def db_get_user(self, user_id: int) -> dict:
-        d = await self.database.fetchrow(
-            "SELECT * FROM public.user WHERE id = $1", user_id
-        )
+    async def close(self) -> None:
+        await super().close()
+        await self.nodes.close()
+        await self.guild_states.close()
+
+        if database := getattr(self, "database", None):
+            if self.search_cache.store is not None:
+                await self.search_cache.store.close()
+
+            await database.close()
+            self.logger.getChild("database").info("Database pool closed")
+
+    async def _database_init(self, connection: asyncpg.Connection) -> None:
+        # Run once for every new connection the pool opens
+        for statement in self.config["database"]["init"]:
+            await connection.execute(statement)
+
+    async def _database_setup(self, connection: asyncpg.Connection) -> None:
+        # Run every time a connection is acquired from the pool
+        for statement in self.config["database"]["setup"]:
+            await connection.execute(statement)
+
+    def acquire(
+        self, *, timeout: typing.Optional[float] = None
+    ) -> typing.AsyncContextManager[asyncpg.Connection]:
+        """Acquire a connection from the database pool
 
-        if d:
-            return dict(d)
+        :param timeout: Seconds to wait for a free connection, defaults to None
+        :type timeout: typing.Optional[float], optional
+        :return: Context manager yielding the connection
+        :rtype: typing.AsyncContextManager[asyncpg.Connection]
+        """
+        return self.database.acquire(timeout=timeout)
 
-    async def db_create_user(self, user_id: int) -> None:
-        await self.database.execute("INSERT INTO public.user VALUES ($1)", user_id)
+    @contextlib.asynccontextmanager
+    async def transaction(
+        self, *, timeout: typing.Optional[float] = None, **kwargs
+    ) -> typing.AsyncIterator[asyncpg.Connection]:
+        """Acquire a connection and open a transaction on it
 
-    async def ensure_user(self, user_id: int) -> None:
-        user = await self.db_get_user(user_id)
-        if not user:
-            await self.db_create_user(user_id)
+        :param timeout: Seconds to wait for a free connection, defaults to None
+        :type timeout: typing.Optional[float], optional
+        :return: Context manager yielding the connection
+        :rtype: typing.AsyncIterator[asyncpg.Connection]
+        """
+        async with self.acquire(timeout=timeout) as connection:
+            async with connection.transaction(**kwargs):
+                yield connection
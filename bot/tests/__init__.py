@@ -0,0 +1,4 @@
+"""Unit tests
+
+Run them from the bot directory, e.g. ``python -m unittest tests.test_queue``.
+"""
@@ -0,0 +1,148 @@
+"""Player.prefetch and Player.play_next when Lavalink fails to decode a track
+
+Entries Lavalink rejects are dropped, entries the node failed to answer for
+are kept for another try.
+"""
+
+import types
+import unittest
+
+import aiohttp
+import wavelink
+
+from plugins.utils.player import Player, QueueEntry
+
+
+def error(status: int) -> wavelink.LavalinkException:
+    return wavelink.LavalinkException(
+        data={
+            "timestamp": 0,
+            "status": status,
+            "error": "Error",
+            "path": "/v4/decodetrack",
+        }
+    )
+
+
+def payload(encoded: str) -> dict:
+    return {
+        "encoded": encoded,
+        "info": {
+            "identifier": encoded,
+            "isSeekable": True,
+            "author": "author",
+            "length": 180000,
+            "isStream": False,
+            "position": 0,
+            "title": encoded,
+            "uri": None,
+            "artworkUrl": None,
+            "isrc": None,
+            "sourceName": "youtube",
+        },
+        "pluginInfo": {},
+        "userData": {},
+    }
+
+
+class Node:
+    """Decodes tracks, or raises what ``failures`` holds for them"""
+
+    identifier = "test"
+    client = None
+    _inactive_player_timeout = None
+
+    def __init__(self) -> None:
+        self.players: dict = {}
+        self.failures: dict = {}
+        self.decoded: list = []
+
+    async def send(self, method: str, *, path: str, params: dict) -> dict:
+        encoded = params["encodedTrack"]
+        self.decoded.append(encoded)
+        if encoded in self.failures:
+            raise self.failures[encoded]
+        return payload(encoded)
+
+
+class PlayerTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.node = Node()
+        self.player = Player(nodes=[self.node])
+        self.player._guild = types.SimpleNamespace(id=1)
+        # Nothing to play on, note what would have been
+        self.played: list = []
+
+        async def play(track: wavelink.Playable, **kwargs) -> wavelink.Playable:
+            self.played.append(track.encoded)
+            return track
+
+        self.player.play = play
+
+    def queue(self, *encoded: str) -> None:
+        # Deeper than Queue.live, so they are decoded when due
+        self.player.queue.put(
+            [QueueEntry(e, "author", None, 180000, e) for e in ("x", "y", *encoded)]
+        )
+        self.player.queue.delete(0)
+        self.player.queue.delete(0)
+
+    def queued(self) -> list:
+        return [item.encoded for item in self.player.queue]
+
+    async def test_rejected_tracks_are_dropped(self) -> None:
+        self.node.failures = {
+            "a": error(400),
+            "b": wavelink.LavalinkLoadException(
+                data={"message": "Gone", "severity": "common", "cause": "Gone"}
+            ),
+        }
+        self.queue("a", "b", "c", "d")
+
+        await self.player.prefetch()
+        self.assertEqual(self.queued(), ["c", "d"])
+        self.assertEqual(self.player.skipped, 2)
+
+        await self.player.play_next()
+        self.assertEqual(self.played, ["c"])
+        self.assertEqual(self.player.prefetch_hits, 1)
+
+    async def test_rejected_track_is_skipped_when_played(self) -> None:
+        self.node.failures = {"a": error(404)}
+        self.queue("a", "b")
+
+        await self.player.play_next()
+        self.assertEqual(self.played, ["b"])
+        self.assertEqual(self.queued(), [])
+        self.assertEqual(self.player.skipped, 1)
+
+    async def test_node_errors_keep_the_track_when_prefetching(self) -> None:
+        for failure in (
+            error(500),
+            wavelink.NodeException(status=502),
+            aiohttp.ClientConnectionError(),
+        ):
+            with self.subTest(failure=failure):
+                self.node.failures = {"a": failure}
+                self.player.queue.clear()
+                self.queue("a", "b")
+
+                await self.player.prefetch()
+                self.assertEqual(self.queued(), ["a", "b"])
+                self.assertIsNone(self.player._prefetched)
+                self.assertEqual(self.player.skipped, 0)
+
+    async def test_node_errors_keep_the_track_when_playing(self) -> None:
+        self.node.failures = {"a": error(503)}
+        self.queue("a", "b")
+
+        with self.assertRaises(wavelink.LavalinkException):
+            await self.player.play_next()
+        self.assertEqual(self.queued(), ["a", "b"])
+        self.assertEqual(self.played, [])
+
+        # The node is back, the same track is tried again
+        self.node.failures = {}
+        await self.player.play_next()
+        self.assertEqual(self.played, ["a"])
+        self.assertEqual(self.queued(), ["b"])
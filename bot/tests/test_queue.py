@@ -0,0 +1,284 @@
+"""AsyncLoopShuffleQueue against the implementation it replaced
+
+Random sequences of operations are applied to both queues and every result
+is compared, over the operations the old queue got right. Where the old
+queue was wrong, the new behaviour is tested on its own in
+:class:`BehaviourTests`.
+"""
+
+import asyncio
+import collections
+import itertools
+import random
+import unittest
+
+from plugins.utils.queue import AsyncLoopShuffleQueue, Loop
+
+from .baseline_queue import AsyncLoopShuffleQueue as BaselineQueue
+from .baseline_queue import Loop as BaselineLoop
+
+
+class Pair:
+    """A new and an old queue, with the operations the old one got right"""
+
+    def __init__(self, rng: random.Random, items: list) -> None:
+        self.rng = rng
+        self.new = AsyncLoopShuffleQueue(items)
+        self.old = BaselineQueue(list(items))
+        self._items = itertools.count(len(items))
+
+        # The old history stops matching after a previous(), a get() while
+        # looping one item or switching to it, and after wrapping round
+        self.history_ok = True
+        # The old previous() didn't make the item current, so current differs
+        # until the next get()
+        self.rewound = False
+
+        self.log: list = []
+
+    @property
+    def pending(self) -> list:
+        return list(self.old._up_next._queue)
+
+    def check(self, op: str, new, old) -> None:
+        self.log.append(op)
+        context = f"after {self.log}"
+        assert new == old, f"{op} returned {new!r}, expected {old!r} {context}"
+        assert len(self.new) == len(self.pending), f"length differs {context}"
+        if not self.rewound:
+            assert self.new.current == self.old._current, f"current differs {context}"
+
+    def options(self) -> list:
+        old = self.old
+        mode = old._loop
+        options = [self.put, self.put, self.put, self.putleft, self.loop]
+
+        if self.pending:
+            options += [self.get] * 4
+        elif mode is BaselineLoop.ALL and (old._current is not None or old._history):
+            # Wraps round, the old queue also did with looping off
+            options += [self.get] * 4
+
+        if mode is BaselineLoop.ONE and old._current is not None and not self.rewound:
+            options.append(self.get_unforced)
+
+        if self.history_ok:
+            options.append(self.previous)
+
+        # Shuffling twice should leave the upcoming items as they were, which
+        # the old queue only did if they were all the items after the current
+        if not self.rewound and old._current is not None:
+            original = list(old._original)
+            if self.pending == original[original.index(old._current) + 1 :]:
+                options.append(self.shuffle_twice)
+
+        return options
+
+    async def step(self) -> None:
+        await self.rng.choice(self.options())()
+
+    async def put(self) -> None:
+        item = next(self._items)
+        self.check(f"put({item})", self.new.put(item), self.old.put(item))
+
+    async def putleft(self) -> None:
+        item = next(self._items)
+        self.check(f"putleft({item})", self.new.putleft(item), self.old.putleft(item))
+
+    async def get(self) -> None:
+        if self.old._loop is BaselineLoop.ONE or not self.pending:
+            self.history_ok = False
+
+        self.rewound = False
+        self.check("get()", await self.new.get(), await self.old.get())
+
+    async def get_unforced(self) -> None:
+        new = await self.new.get(force=False)
+        self.check("get(force=False)", new, await self.old.get(force=False))
+
+    async def loop(self) -> None:
+        mode = self.new.loop()
+        if mode is Loop.ONE:
+            self.history_ok = False
+        self.check("loop()", mode.name, self.old.loop().name)
+
+    async def previous(self) -> None:
+        new, old = self.new.previous(), self.old.previous()
+        if old is not None:
+            self.history_ok = False
+            self.rewound = True
+        self.check("previous()", new, old)
+
+    async def shuffle_twice(self) -> None:
+        # The old shuffle() put the played items back, only compare the pair
+        self.check(
+            "shuffle() x2",
+            (self.new.shuffle(), self.new.shuffle()),
+            (self.old.shuffle(), self.old.shuffle()),
+        )
+
+    async def drain(self) -> None:
+        """Play what is left without looping"""
+        while self.new._loop is not Loop.OFF:
+            await self.loop()
+
+        while self.pending:
+            await self.get()
+
+        self.check("drain", len(self.new), 0)
+
+
+class EquivalenceTests(unittest.IsolatedAsyncioTestCase):
+    async def test_random_operations(self) -> None:
+        for seed in range(300):
+            rng = random.Random(seed)
+            random.seed(seed)
+
+            pair = Pair(rng, list(range(rng.randrange(6))))
+            for _ in range(200):
+                await pair.step()
+            await pair.drain()
+
+    async def test_loop_all_wraps_in_insertion_order(self) -> None:
+        new, old = AsyncLoopShuffleQueue([1, 2, 3]), BaselineQueue([1, 2, 3])
+        new.putleft(0)
+        old.putleft(0)
+        new.loop()
+        old.loop()
+
+        self.assertEqual(
+            [await new.get() for _ in range(8)], [await old.get() for _ in range(8)]
+        )
+
+    async def test_loop_one_repeats_current(self) -> None:
+        new, old = AsyncLoopShuffleQueue([1, 2]), BaselineQueue([1, 2])
+        for queue in (new, old):
+            await queue.get()
+            queue.loop()
+            queue.loop()
+
+        for _ in range(3):
+            self.assertEqual(await new.get(force=False), await old.get(force=False))
+        self.assertEqual(await new.get(), await old.get())
+
+    async def test_previous_plays_current_next(self) -> None:
+        new, old = AsyncLoopShuffleQueue([1, 2, 3]), BaselineQueue([1, 2, 3])
+        for queue in (new, old):
+            await queue.get()
+            await queue.get()
+
+        self.assertEqual(new.previous(), old.previous())
+        self.assertEqual(await new.get(), await old.get())
+        self.assertEqual(await new.get(), await old.get())
+
+
+class BehaviourTests(unittest.IsolatedAsyncioTestCase):
+    """Where the new queue deliberately differs from the old one"""
+
+    def setUp(self) -> None:
+        random.seed(0)
+
+    async def test_wrap_starts_history_afresh(self) -> None:
+        queue = AsyncLoopShuffleQueue([1, 2])
+        queue.loop()
+        for _ in range(3):
+            await queue.get()
+
+        self.assertIsNone(queue.previous())
+        self.assertEqual(await queue.get(), 2)
+        self.assertEqual(queue.previous(), 1)
+
+    async def test_loop_off_waits_instead_of_wrapping(self) -> None:
+        queue = AsyncLoopShuffleQueue([1])
+        await queue.get()
+
+        getter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0.01)
+        self.assertFalse(getter.done())
+
+        queue.put(2)
+        self.assertEqual(await getter, 2)
+
+    async def test_previous_makes_item_current(self) -> None:
+        queue = AsyncLoopShuffleQueue([1, 2, 3])
+        await queue.get()
+        await queue.get()
+
+        self.assertEqual(queue.previous(), 1)
+        self.assertEqual(queue.current, 1)
+        self.assertEqual(await queue.get(), 2)
+        self.assertEqual(queue.previous(), 1)
+        self.assertIsNone(AsyncLoopShuffleQueue().previous())
+
+    async def test_shuffle_plays_upcoming_once(self) -> None:
+        queue = AsyncLoopShuffleQueue(range(100))
+        await queue.get()
+        await queue.get()
+        self.assertTrue(queue.shuffle())
+
+        played = [await queue.get() for _ in range(98)]
+        self.assertEqual(sorted(played), list(range(2, 100)))
+        self.assertNotEqual(played, list(range(2, 100)))
+        self.assertEqual(len(queue), 0)
+
+    async def test_shuffle_without_current(self) -> None:
+        queue = AsyncLoopShuffleQueue(range(5))
+        self.assertTrue(queue.shuffle())
+        self.assertEqual(sorted([await queue.get() for _ in range(5)]), list(range(5)))
+
+    async def test_shuffle_is_uniform(self) -> None:
+        counts = collections.Counter()
+        draws = 12000
+        for _ in range(draws):
+            queue = AsyncLoopShuffleQueue(range(4))
+            queue.shuffle()
+            counts[tuple([await queue.get() for _ in range(4)])] += 1
+
+        self.assertEqual(len(counts), 24)
+        for order, count in counts.items():
+            self.assertAlmostEqual(count, draws / 24, delta=draws / 24 * 0.2, msg=order)
+
+    async def test_unshuffle_restores_insertion_order(self) -> None:
+        queue = AsyncLoopShuffleQueue(range(10))
+        await queue.get()
+        queue.shuffle()
+        played = {await queue.get() for _ in range(3)}
+        queue.put(10)
+        self.assertFalse(queue.shuffle())
+
+        rest = [await queue.get() for _ in range(len(queue))]
+        self.assertEqual(rest, sorted(set(range(1, 11)) - played))
+
+    async def test_putleft_plays_next_while_shuffled(self) -> None:
+        queue = AsyncLoopShuffleQueue(range(10))
+        queue.shuffle()
+        await queue.get()
+        queue.putleft("a")
+        queue.putleft("b")
+
+        self.assertEqual(await queue.get(), "b")
+        self.assertEqual(await queue.get(), "a")
+
+    async def test_loop_all_wraps_in_insertion_order_after_shuffle(self) -> None:
+        queue = AsyncLoopShuffleQueue(range(5))
+        queue.loop()
+        queue.shuffle()
+        first = [await queue.get() for _ in range(5)]
+        self.assertEqual(sorted(first), list(range(5)))
+
+        queue.shuffle()
+        self.assertEqual([await queue.get() for _ in range(5)], list(range(5)))
+
+    async def test_cancelled_getter_passes_wakeup_on(self) -> None:
+        queue = AsyncLoopShuffleQueue()
+        first = asyncio.ensure_future(queue.get())
+        second = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+
+        queue.put(1)
+        first.cancel()
+        self.assertEqual(await second, 1)
+
+    async def test_items_default_not_shared(self) -> None:
+        AsyncLoopShuffleQueue().put(1)
+        self.assertEqual(len(AsyncLoopShuffleQueue()), 0)
@@ -0,0 +1,172 @@
+"""Reminder claims shared between instances, against a real database
+
+Skipped unless ``TEST_DATABASE_DSN`` points at a Postgres database the tests
+may create (and drop) a schema in.
+"""
+
+import asyncio
+import collections
+import datetime
+import os
+import unittest
+import uuid
+
+import asyncpg
+
+from plugins.utils.claims import CLAIM_COLUMNS, CLAIM_REMINDERS, HAS_CLAIM_COLUMNS
+from plugins.utils.delivery import DeliveryPipeline
+from plugins.utils.scheduler import Scheduler, utcnow
+
+DSN = os.getenv("TEST_DATABASE_DSN")
+
+CREATE_TABLE = """
+CREATE TABLE reminder (
+    id BIGSERIAL PRIMARY KEY,
+    member BIGINT NOT NULL,
+    reason TEXT,
+    channel BIGINT,
+    created TIMESTAMPTZ,
+    due TIMESTAMPTZ
+)
+"""
+
+
+class Claimer:
+    """One instance, loading and completing reminders like the Reminder cog"""
+
+    def __init__(self, pool: asyncpg.Pool, instance: str, delivered: list) -> None:
+        self.pool = pool
+        self.instance = instance
+        self.delivered = delivered
+        self.lease = datetime.timedelta(seconds=60)
+
+        self.pipeline = DeliveryPipeline(
+            self.deliver,
+            self.complete,
+            lambda reminder, delay: self.scheduler.retry(reminder, delay),
+            key=lambda reminder: reminder["channel"],
+            rate=1000,
+            per=1.0,
+            batch_interval=0.05,
+        )
+        # A short horizon, so both instances keep claiming from the same stretch
+        self.scheduler = Scheduler(self.load, self.pipeline.submit, horizon=0.2)
+
+    async def load(self, until: datetime.datetime, limit: int) -> list:
+        reminders = await self.pool.fetch(
+            CLAIM_REMINDERS, until, self.instance, limit, until + self.lease
+        )
+        return sorted(reminders, key=lambda r: (r["due"], r["id"]))
+
+    async def deliver(self, reminder: asyncpg.Record) -> bool:
+        self.delivered.append((self.instance, reminder["id"]))
+        return True
+
+    async def complete(self, ids: list) -> None:
+        await self.pool.execute(
+            "DELETE FROM reminder WHERE id = ANY($1::bigint[])", ids
+        )
+        self.scheduler.release(*ids)
+
+    def start(self) -> None:
+        self.pipeline.start()
+        self.scheduler.start()
+
+    async def stop(self) -> None:
+        self.scheduler.stop()
+        await self.pipeline.close()
+
+
+@unittest.skipUnless(DSN, "TEST_DATABASE_DSN is not set")
+class ClaimTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.schema = f"test_{uuid.uuid4().hex}"
+        connection = await asyncpg.connect(DSN)
+        try:
+            await connection.execute(f"CREATE SCHEMA {self.schema}")
+        finally:
+            await connection.close()
+
+        self.pool = await asyncpg.create_pool(
+            DSN, min_size=1, max_size=4, server_settings={"search_path": self.schema}
+        )
+        await self.pool.execute(CREATE_TABLE)
+
+        self.assertFalse(await self.pool.fetchval(HAS_CLAIM_COLUMNS))
+        await self.pool.execute(CLAIM_COLUMNS)
+        self.assertTrue(await self.pool.fetchval(HAS_CLAIM_COLUMNS))
+
+        self.claimers: list = []
+
+    async def asyncTearDown(self) -> None:
+        for claimer in self.claimers:
+            await claimer.stop()
+
+        await self.pool.execute(f"DROP SCHEMA {self.schema} CASCADE")
+        await self.pool.close()
+
+    async def insert(self, count: int, *, within: float) -> list:
+        now = utcnow()
+        rows = [
+            (
+                i,
+                f"reminder {i}",
+                i % 7,
+                now,
+                now + datetime.timedelta(seconds=within * i / count),
+            )
+            for i in range(count)
+        ]
+        await self.pool.executemany(
+            "INSERT INTO reminder (member, reason, channel, created, due) "
+            "VALUES ($1, $2, $3, $4, $5)",
+            rows,
+        )
+        return [r["id"] for r in await self.pool.fetch("SELECT id FROM reminder")]
+
+    def claimer(self, instance: str, delivered: list) -> Claimer:
+        claimer = Claimer(self.pool, instance, delivered)
+        self.claimers.append(claimer)
+        claimer.start()
+        return claimer
+
+    async def drained(self, timeout: float) -> None:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while await self.pool.fetchval("SELECT count(*) FROM reminder"):
+            self.assertLess(
+                asyncio.get_running_loop().time(), deadline, "reminders left over"
+            )
+            await asyncio.sleep(0.05)
+
+    async def test_two_claimers_deliver_each_reminder_once(self) -> None:
+        ids = await self.insert(300, within=2.5)
+
+        delivered: list = []
+        self.claimer("a", delivered)
+        self.claimer("b", delivered)
+        await self.drained(10)
+        # Let anything delivered twice show up
+        await asyncio.sleep(0.3)
+
+        counts = collections.Counter(id for _, id in delivered)
+        self.assertEqual(set(counts), set(ids))
+        self.assertEqual(max(counts.values()), 1)
+        self.assertEqual({instance for instance, _ in delivered}, {"a", "b"})
+
+    async def test_expired_lease_is_claimed_again(self) -> None:
+        ids = await self.insert(20, within=0)
+
+        # An instance claims everything, then goes away without delivering
+        until = utcnow() + datetime.timedelta(seconds=1)
+        lease = utcnow() + datetime.timedelta(seconds=0.5)
+        claimed = await self.pool.fetch(CLAIM_REMINDERS, until, "gone", 100, lease)
+        self.assertEqual(len(claimed), len(ids))
+        self.assertEqual(
+            await self.pool.fetch(CLAIM_REMINDERS, until, "b", 100, lease), []
+        )
+
+        delivered: list = []
+        self.claimer("b", delivered)
+        await self.drained(10)
+
+        self.assertCountEqual(delivered, [("b", id) for id in ids])